@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+''' 8-fold symmetry augmentation of the (2, size, size) board planes, done on the batches (nothing is stored).
+
+The 8 symmetries of the board (4 rotations, each one flipped or not) do not change the win rate of a position, so
+the targets are kept as they are:
+    - RandomSymmetries is a collate_fn for the DataLoader: each board of the batch gets one of the 8 symmetries at
+      random (a different view of the data at each epoch),
+    - AllSymmetries is a collate_fn giving the 8 symmetric boards of each sample (batches 8 times larger),
+    - predict_tta() averages the predictions of the model over the 8 symmetries, in one forward pass.
+
+    train_loader = DataLoader(godataset.load("samples-8x8"), batch_size=128, shuffle=True,
+                              collate_fn=augment.RandomSymmetries())
+    prediction = augment.position_predict(model, data[10]["black_stones"], data[10]["white_stones"])
+'''
+import numpy as np
+import torch
+from torch.utils.data import default_collate
+
+import godataset
+
+
+def symmetry(boards, k):
+    ''' Boards (..., size, size) turned by k % 4 quarters, then flipped if k >= 4.'''
+    boards = torch.rot90(boards, k % 4, dims=(-2, -1))
+    return torch.flip(boards, dims=(-1,)) if k >= 4 else boards
+
+
+def symmetries(boards):
+    ''' (8, ...) tensor of the 8 symmetric boards of each of the boards (..., size, size).'''
+    return torch.stack([symmetry(boards, k) for k in range(8)])
+
+
+def random_symmetries(boards, generator=None):
+    ''' Each board of the (B, ..., size, size) batch transformed by one of the 8 symmetries, drawn uniformly.'''
+    choice = torch.randint(8, (len(boards),), generator=generator)
+    result = torch.empty_like(boards)
+    for k in range(8): # one transform per group of boards with the same symmetry, no 8 times larger copy
+        group = (choice == k).nonzero().squeeze(1)
+        if len(group):
+            result[group] = symmetry(boards[group], k)
+    return result
+
+
+class RandomSymmetries:
+    ''' collate_fn of the DataLoader applying a random symmetry to each board (see random_symmetries).'''
+
+    def __init__(self, generator=None, collate=default_collate):
+        self.generator = generator
+        self.collate = collate
+
+    def __call__(self, batch):
+        boards, targets = self.collate(batch)
+        return random_symmetries(boards, self.generator), targets
+
+
+class AllSymmetries:
+    ''' collate_fn of the DataLoader giving the 8 symmetric boards of each sample, as 8 * B (boards, targets).'''
+
+    def __init__(self, collate=default_collate):
+        self.collate = collate
+
+    def __call__(self, batch):
+        boards, targets = self.collate(batch)
+        return symmetries(boards).flatten(0, 1), targets.repeat(8, *[1] * (targets.dim() - 1))
+
+
+def predict_tta(model, boards):
+    ''' Predictions of the model for the (B, 2, size, size) boards, averaged over their 8 symmetries (one forward
+    pass of 8 * B boards).'''
+    with torch.inference_mode():
+        predictions = model(symmetries(boards).flatten(0, 1))
+    return predictions.reshape(8, len(boards), *predictions.shape[1:]).mean(dim=0)
+
+
+def position_predict(model, black_stones, white_stones, size=8):
+    ''' Black win rate of the position given by the names of its stones (as in the samples), with predict_tta.'''
+    sample = {name: 0 for name in godataset.LABELS}
+    sample.update(black_stones=black_stones, white_stones=white_stones, list_of_moves=[])
+    boards = torch.from_numpy(godataset.unpack(godataset.pack([sample], size)[0], size).astype(np.float32))
+    return float(predict_tta(model, boards)[0, 0])
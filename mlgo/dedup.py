@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+''' Removes the duplicate positions of a set of Go samples, merging their labels.
+
+Two samples are the same position if they have the same stones and the same player to play (the parity of
+list_of_moves). The key of a sample is the Zobrist hash of its stones computed with the table of Goban.Board (the
+smallest of the 8 symmetric hashes with --symmetries, as Board.canonical_hash), mixed with Board's white pass hash
+when white is to play. The duplicates are merged into the first one: rollouts, black_wins, black_points, white_wins
+and white_points are summed, so the win rate is the one of all their rollouts.
+
+The samples are streamed in two passes with on-disk hash partitioning, to handle sets larger than the memory:
+    1. each sample is appended to the partition file of its key (key % partitions),
+    2. each partition is merged in a dict, and written as one gzipped JSONL shard of the output directory.
+Only one partition is in memory at a time. The output directory can be read by selfplay.load or
+godataset.convert.
+
+    python3 dedup.py samples-8x8.json.gz samples-8x8-dedup
+    python3 dedup.py selfplay selfplay-dedup --symmetries -p 256
+'''
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "projet_go"))
+
+import Goban
+import godataset
+import selfplay
+
+SUMMED = ("rollouts", "black_wins", "black_points", "white_wins", "white_points")
+
+
+class Hasher:
+    ''' Zobrist keys of samples, by chunks.'''
+
+    def __init__(self, size=8, symmetries=False):
+        Goban.Board._BOARDSIZE = size
+        board = Goban.Board()
+        self.size = size
+        self.symmetries = symmetries
+        # [fcoord, color - 1, symmetry] -> Zobrist value of the stone on the symmetric point
+        self.table = board._symPositionHashes if symmetries else board._positionHashes[:, :, None]
+        self.whiteToPlay = board._passHashW
+
+    def cells(self, samples):
+        ''' (len(samples), size * size) cells of the samples, as Goban.Board.get_board().'''
+        cells = np.zeros((len(samples), self.size ** 2), dtype=np.int8)
+        for k, sample in enumerate(samples):
+            for color, key in ((Goban.Board._BLACK, "black_stones"), (Goban.Board._WHITE, "white_stones")):
+                cells[k, [godataset.flat_of_name(name, self.size) for name in sample[key]]] = color
+        return cells
+
+    def keys(self, samples):
+        ''' List of the keys (python ints) of the samples.'''
+        cells = self.cells(samples)[:, :, None]
+        hashes = (np.where(cells == Goban.Board._BLACK, self.table[:, 0], 0)
+                  ^ np.where(cells == Goban.Board._WHITE, self.table[:, 1], 0))
+        hashes = np.bitwise_xor.reduce(hashes, axis=1).min(axis=1)
+        white = np.array([len(sample["list_of_moves"]) % 2 == 1 for sample in samples])
+        return np.where(white, hashes ^ self.whiteToPlay, hashes).tolist()
+
+
+def merge(sample, other):
+    for name in SUMMED:
+        sample[name] += other[name]
+
+
+def partition(source, directory, hasher, partitions, chunk=4096):
+    ''' Pass 1: appends each sample of source to the file of its partition ("key<tab>json" lines) and returns the
+    number of samples.'''
+    files = [open(os.path.join(directory, f"{p:05d}.txt"), "w") for p in range(partitions)]
+    count = 0
+    try:
+        batch = []
+        for sample in selfplay.iter_samples(source):
+            batch.append(sample)
+            if len(batch) == chunk:
+                count += _write_partitions(batch, files, hasher)
+                batch = []
+        count += _write_partitions(batch, files, hasher)
+    finally:
+        for f in files:
+            f.close()
+    return count
+
+
+def _write_partitions(samples, files, hasher):
+    if not samples:
+        return 0
+    for key, sample in zip(hasher.keys(samples), samples):
+        files[key % len(files)].write(f"{key}\t{json.dumps(sample)}\n")
+    return len(samples)
+
+
+def merge_partition(path, output):
+    ''' Pass 2: merges the duplicates of one partition file and writes them in the output shard. Returns the number
+    of distinct samples.'''
+    samples = {}
+    with open(path) as f:
+        for line in f:
+            key, text = line.split("\t", 1)
+            sample = json.loads(text)
+            if key in samples:
+                merge(samples[key], sample)
+            else:
+                samples[key] = sample
+    with gzip.open(output + ".tmp", "wt") as f:
+        for sample in samples.values():
+            f.write(json.dumps(sample) + "\n")
+    os.replace(output + ".tmp", output)
+    return len(samples)
+
+
+def dedup(source, directory, size=8, symmetries=False, partitions=64, tmp=None, verbosity=1):
+    ''' Writes the samples of source (see selfplay.iter_samples) without duplicates in partitions shards of the
+    directory. Returns (number of samples read, number of samples written).'''
+    start = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    work = tempfile.mkdtemp(prefix="dedup-", dir=tmp if tmp is not None else directory)
+    try:
+        read = partition(source, work, Hasher(size, symmetries), partitions)
+        written = 0
+        for p in range(partitions):
+            written += merge_partition(os.path.join(work, f"{p:05d}.txt"),
+                                       os.path.join(directory, f"dedup-{size}x{size}-{p:05d}.jsonl.gz"))
+    finally:
+        shutil.rmtree(work)
+    if verbosity >= 1:
+        print(f"{read} samples, {written} distinct positions ({read - written} duplicates merged) in "
+              f"{time.perf_counter() - start:.1f} seconds", file=sys.stderr)
+    return read, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merges the duplicate positions of Go samples")
+    parser.add_argument("source", help="samples-8x8.json.gz file, selfplay.py shard or directory of shards")
+    parser.add_argument("directory", help="output directory")
+    parser.add_argument("-s", "--size", type=int, default=8, help="board size")
+    parser.add_argument("--symmetries", action="store_true", help="also merge the symmetric positions")
+    parser.add_argument("-p", "--partitions", type=int, default=64,
+                        help="number of partitions (and output shards): each one must fit in memory")
+    parser.add_argument("--tmp", default=None, help="directory of the partition files (default: the output one)")
+    parser.add_argument("-v", "--verbosity", type=int, default=1)
+    args = parser.parse_args()
+    dedup(args.source, args.directory, args.size, args.symmetries, args.partitions, args.tmp, args.verbosity)
+
+
+if __name__ == '__main__':
+    main()
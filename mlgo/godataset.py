@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+''' Packed columnar format for the Go training samples, loaded without parsing nor copying.
+
+A dataset is a directory of .npy columns (one row per sample) and a meta.json file:
+    - planes.npy        uint8 (N, 2 * size * size / 8): the black and white planes, bit-packed (np.packbits). Once
+                        unpacked, planes[k, c, x, y] is 1 if there is a stone of the color c (0 black, 1 white) on
+                        the column x (A = 0) and line y (1 = 0), as built by data_to_dataset in the notebook,
+    - rollouts.npy, black_wins.npy, black_points.npy, white_wins.npy, white_points.npy, depth.npy   int32 (N,),
+    - moves.npy         int8 flat moves of all the games one after the other (-1 for PASS), and moves_index.npy
+                        int64 (N + 1,) where the moves of sample k are moves[moves_index[k]:moves_index[k + 1]].
+
+convert() builds it from a samples-8x8.json.gz file or selfplay.py shards (keeping only the packed columns in
+memory), and load() maps it read-only: the dataset takes its size on disk, and the planes of a batch are unpacked
+when the batch is read.
+
+    python3 godataset.py samples-8x8.json.gz samples-8x8          --> samples-8x8/planes.npy, ...
+    python3 godataset.py selfplay selfplay-packed
+
+    dataset = godataset.load("samples-8x8")
+    train_loader = DataLoader(dataset, batch_size=128, shuffle=True)   --> ([black, white] planes, [black win rate])
+'''
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+import selfplay
+
+LABELS = ("rollouts", "black_wins", "black_points", "white_wins", "white_points", "depth")
+
+
+def flat_of_name(name, size):
+    ''' Flat move (y * size + x, -1 for PASS) of a name as "E5" (Goban.Board.name_to_flat for any board size).'''
+    if name == "PASS":
+        return -1
+    return (int(name[1:]) - 1) * size + "ABCDEFGHJ".index(name[0])
+
+
+def pack(samples, size=8):
+    ''' (planes, {label: column}, moves, moves_index) arrays of the samples.'''
+    if not samples:
+        return (np.zeros((0, (2 * size * size + 7) // 8), dtype=np.uint8),
+                {name: np.zeros(0, dtype=np.int32) for name in LABELS}, np.zeros(0, dtype=np.int8),
+                np.zeros(1, dtype=np.int64))
+    planes = np.zeros((len(samples), 2, size, size), dtype=np.uint8)
+    labels = {name: np.empty(len(samples), dtype=np.int32) for name in LABELS}
+    moves = []
+    moves_index = np.zeros(len(samples) + 1, dtype=np.int64)
+    letters = "ABCDEFGHJ"
+    for k, sample in enumerate(samples):
+        for c, color in enumerate(("black_stones", "white_stones")):
+            for name in sample[color]:
+                planes[k, c, letters.index(name[0]), int(name[1:]) - 1] = 1
+        for name in LABELS:
+            labels[name][k] = sample[name]
+        moves.extend(flat_of_name(m, size) for m in sample["list_of_moves"])
+        moves_index[k + 1] = len(moves)
+    return np.packbits(planes.reshape(len(samples), -1), axis=1), labels, np.array(moves, dtype=np.int8), moves_index
+
+
+def unpack(planes, size=8):
+    ''' (N, 2, size, size) uint8 planes of (N, packed) rows of planes.npy.'''
+    return np.unpackbits(planes, axis=1, count=2 * size * size).reshape(len(planes), 2, size, size)
+
+
+def convert(source, directory, size=8, chunk=65536, verbosity=1):
+    ''' Writes the samples of source (see selfplay.iter_samples) as a packed dataset in the directory, and returns
+    their number. The samples are packed by chunks, so only the packed arrays are kept in memory.'''
+    start = time.perf_counter()
+    chunks = []
+    batch = []
+    for sample in selfplay.iter_samples(source):
+        batch.append(sample)
+        if len(batch) == chunk:
+            chunks.append(pack(batch, size))
+            batch = []
+            if verbosity >= 1:
+                print(f"{len(chunks) * chunk} samples packed", file=sys.stderr)
+    if batch or not chunks:
+        chunks.append(pack(batch, size))
+
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "planes.npy"), np.concatenate([c[0] for c in chunks]))
+    for name in LABELS:
+        np.save(os.path.join(directory, name + ".npy"), np.concatenate([c[1][name] for c in chunks]))
+    np.save(os.path.join(directory, "moves.npy"), np.concatenate([c[2] for c in chunks]))
+    offsets = np.cumsum([0] + [len(c[2]) for c in chunks[:-1]])
+    moves_index = np.concatenate([chunks[0][3][:1]] + [c[3][1:] + o for c, o in zip(chunks, offsets)])
+    np.save(os.path.join(directory, "moves_index.npy"), moves_index)
+    count = len(moves_index) - 1
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"size": size, "samples": count, "source": source}, f)
+    if verbosity >= 1:
+        print(f"{count} samples written in {directory} in {time.perf_counter() - start:.1f} seconds", file=sys.stderr)
+    return count
+
+
+class PackedDataset(torch.utils.data.Dataset):
+    ''' Samples of a packed dataset, as the TensorDataset of data_to_dataset: dataset[k] is (planes, target) with the
+    float (2, size, size) planes and the (1,) black win rate. The columns are memory-mapped (or loaded if
+    mmap=False); the DataLoader fetches a whole batch with __getitems__, unpacked at once.'''
+
+    def __init__(self, directory, mmap=True):
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.size = self.meta["size"]
+        mode = "r" if mmap else None
+        column = lambda name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mode)
+        self.planes = column("planes")
+        self.labels = {name: column(name) for name in LABELS}
+        self.moves = column("moves")
+        self.moves_index = column("moves_index")
+
+    def __len__(self):
+        return len(self.planes)
+
+    def targets(self, indices):
+        ''' (len(indices), 1) float tensor of the black win rates.'''
+        rate = self.labels["black_wins"][indices] / self.labels["rollouts"][indices]
+        return torch.from_numpy(rate.astype(np.float32)).reshape(-1, 1)
+
+    def boards(self, indices):
+        ''' (len(indices), 2, size, size) float tensor of the planes.'''
+        return torch.from_numpy(unpack(self.planes[indices], self.size)).float()
+
+    def __getitem__(self, k):
+        return self.boards([k])[0], self.targets([k])[0]
+
+    def __getitems__(self, indices):
+        indices = np.asarray(indices)
+        return list(zip(self.boards(indices), self.targets(indices)))
+
+    def game_moves(self, k):
+        ''' Flat moves (-1 for PASS) played before the sample k, the next player being black if there is an even
+        number of them.'''
+        return self.moves[self.moves_index[k]:self.moves_index[k + 1]]
+
+    @property
+    def tensors(self):
+        ''' (planes, targets) of all the samples, as TensorDataset.tensors (unpacked in memory).'''
+        indices = np.arange(len(self))
+        return self.boards(indices), self.targets(indices)
+
+
+def load(directory, mmap=True):
+    return PackedDataset(directory, mmap)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts Go samples to a packed dataset directory")
+    parser.add_argument("source", help="samples-8x8.json.gz file, selfplay.py shard or directory of shards")
+    parser.add_argument("directory", help="output directory")
+    parser.add_argument("-s", "--size", type=int, default=8, help="board size")
+    parser.add_argument("-v", "--verbosity", type=int, default=1)
+    args = parser.parse_args()
+    convert(args.source, args.directory, args.size, verbosity=args.verbosity)
+
+
+if __name__ == '__main__':
+    main()
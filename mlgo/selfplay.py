@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+''' Offline self-play generator of training samples, replacing the downloaded samples-8x8.json.gz.
+
+Games are played with Goban.Board, either by random moves (the default) or between two player modules of projet_go
+(as in tournament.py). A few positions of each game are sampled, and the chance of black to win from each of them
+is estimated by random rollouts played all at once by BatchGoban.BatchBoards (the original samples used gnugo
+rollouts, so the targets are noisier but need no external program).
+
+The samples have the schema of samples-8x8.json.gz (depth, list_of_moves, black_stones, white_stones, rollouts,
+black_wins, black_points, white_wins, white_points; the points are the sums of the score differences of the won
+rollouts) and are written one JSON object per line in gzipped shards, one shard per task of the process pool. A
+shard is renamed to its final name only once complete, and a new run numbers its shards after the existing ones
+(with other seeds), so the set can be grown by running the command again.
+
+    python3 selfplay.py                                   --> 10 shards of 1000 8x8 samples in selfplay/, all cores
+    python3 selfplay.py -n 1000 --rollouts 200 -o /data/go
+    python3 selfplay.py --black iterdeep --white mcts -n 4 --per-game 10
+
+    data = selfplay.load("selfplay")                      --> list of the samples of all the shards
+'''
+import argparse
+import glob
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "projet_go"))
+
+import BatchGoban
+import Goban
+import tournament
+
+
+def random_game(rng, max_moves=400):
+    ''' Flat moves of a game of random moves (weak_legal_moves and push_lazy, as bench.random_playout).'''
+    b = Goban.Board()
+    moves = []
+    while not b.is_game_over() and len(moves) < max_moves:
+        m = rng.choice(b.weak_legal_moves())
+        if b.push_lazy(m):
+            moves.append(m)
+    return moves
+
+
+def players_game(black, white, opening=()):
+    ''' Flat moves of a game between two player modules, from the flat moves of opening (the game stops at an
+    illegal move).'''
+    opening = [Goban.Board.flat_to_name(m) for m in opening]
+    return [Goban.Board.name_to_flat(m) for m in tournament.play_game(black, white, opening=opening)["moves"]]
+
+
+def stones(board, color):
+    ''' Names of the stones of the color, by rows from the top as in samples-8x8.json.gz.'''
+    size = Goban.Board._BOARDSIZE
+    return [Goban.Board.flat_to_name(y * size + x) for y in reversed(range(size)) for x in range(size)
+            if board[y * size + x] == color]
+
+
+def sample_positions(moves, per_game, rng):
+    ''' (depth, board) of per_game positions of the game (not over), taken at distinct random depths.'''
+    b = Goban.Board()
+    boards = []
+    for m in moves:
+        b.push_lazy(m)
+        boards.append(None if b.is_game_over() else Goban.Board(b))
+    depths = [d for d in range(1, len(moves) + 1) if boards[d - 1] is not None]
+    return [(d, boards[d - 1]) for d in sorted(rng.sample(depths, min(per_game, len(depths))))]
+
+
+def rollouts(boards, count, rng, batch=1024):
+    ''' (len(boards), 4) array of (black_wins, black_points, white_wins, white_points) over count random rollouts
+    from each board, played by BatchBoards of about batch games.'''
+    results = []
+    step = max(1, batch // count)
+    for i in range(0, len(boards), step):
+        games = BatchGoban.BatchBoards.from_boards(boards[i:i + step], count)
+        scores = games.playout(rng).reshape(-1, count, 2)
+        margin = scores[:, :, 0] - scores[:, :, 1]
+        results.append(np.stack([(margin > 0).sum(axis=1), np.where(margin > 0, margin, 0).sum(axis=1),
+                                 (margin < 0).sum(axis=1), np.where(margin < 0, -margin, 0).sum(axis=1)], axis=1))
+    return np.concatenate(results) if results else np.zeros((0, 4), dtype=int)
+
+
+def generate(samples, seed, size=8, count=100, per_game=2, black=None, white=None, opening=4, max_barren=100):
+    ''' List of samples (dicts) of games played from the seed. The games between players start with opening
+    random moves (deterministic players would otherwise replay the same game). Raises RuntimeError after max_barren
+    games in a row without any position to sample.'''
+    Goban.Board._BOARDSIZE = size
+    rng = random.Random(seed)
+    positions = []
+    barren = 0
+    while len(positions) < samples:
+        if black is None:
+            moves = random_game(rng)
+        else:
+            moves = players_game(black, white, random_game(rng, opening))
+        sampled = sample_positions(moves, per_game, rng)
+        barren = 0 if sampled else barren + 1
+        if barren >= max_barren:
+            raise RuntimeError(f"{max_barren} games in a row without any position to sample")
+        positions.extend((moves[:d], board) for d, board in sampled)
+    positions = positions[:samples]
+    stats = rollouts([board for _, board in positions], count, np.random.default_rng(seed))
+    result = []
+    for (moves, board), (black_wins, black_points, white_wins, white_points) in zip(positions, stats.tolist()):
+        cells = board.get_board()
+        result.append({"depth": len(moves), "list_of_moves": [Goban.Board.flat_to_name(m) for m in moves],
+                       "black_stones": stones(cells, Goban.Board._BLACK),
+                       "white_stones": stones(cells, Goban.Board._WHITE), "rollouts": count,
+                       "black_wins": black_wins, "black_points": black_points,
+                       "white_wins": white_wins, "white_points": white_points})
+    return result
+
+
+def shard_name(directory, size, index):
+    return os.path.join(directory, f"selfplay-{size}x{size}-{index:05d}.jsonl.gz")
+
+
+def next_shard(directory, size):
+    ''' Index of the first shard after the ones already in the directory.'''
+    indices = [int(re.search(r"-(\d+)\.jsonl\.gz$", path).group(1))
+               for path in glob.glob(os.path.join(directory, f"selfplay-{size}x{size}-*.jsonl.gz"))]
+    return max(indices, default=-1) + 1
+
+
+def write_shard(task):
+    ''' Generates one shard (task: directory, index, seed and the arguments of generate) and returns its path and
+    its number of samples.'''
+    directory, index, seed, samples, options = task
+    data = generate(samples, seed, **options)
+    path = shard_name(directory, options["size"], index)
+    with gzip.open(path + ".tmp", "wt") as f:
+        for sample in data:
+            f.write(json.dumps(sample) + "\n")
+    os.replace(path + ".tmp", path) # readers never see a partial shard
+    return path, len(data)
+
+
+def iter_samples(path):
+    ''' Iterates on the samples of a shard, of a directory of shards, or of a samples-8x8.json.gz file (one JSON
+    list, read at once).'''
+    paths = sorted(glob.glob(os.path.join(path, "*.jsonl.gz"))) if os.path.isdir(path) else [path]
+    for p in paths:
+        with gzip.open(p, "rt") as f:
+            if p.endswith(".jsonl.gz"):
+                yield from (json.loads(line) for line in f if line.strip())
+            else:
+                yield from json.load(f)
+
+
+def load(path):
+    ''' List of the samples of a shard, of a directory of shards, or of a samples-8x8.json.gz file.'''
+    return list(iter_samples(path))
+
+
+def run(directory, shards, samples, seed=0, processes=None, verbosity=1, **options):
+    ''' Writes shards more shards of samples samples each in the directory, in a process pool.'''
+    os.makedirs(directory, exist_ok=True)
+    first = next_shard(directory, options["size"])
+    tasks = [(directory, i, seed * 1000003 + i, samples, options) for i in range(first, first + shards)]
+    start = time.perf_counter()
+    total = 0
+    with Pool(processes) as pool:
+        for path, count in pool.imap_unordered(write_shard, tasks):
+            total += count
+            if verbosity >= 1:
+                print(f"{path}: {count} samples ({total / (time.perf_counter() - start):.1f} samples/s)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates self-play training samples in gzipped JSONL shards")
+    parser.add_argument("-o", "--output", default="selfplay", help="directory of the shards")
+    parser.add_argument("-n", "--shards", type=int, default=10, help="number of shards to add")
+    parser.add_argument("--samples", type=int, default=1000, help="samples per shard")
+    parser.add_argument("-s", "--size", type=int, default=8, help="board size")
+    parser.add_argument("--rollouts", type=int, default=100, help="random rollouts per sample")
+    parser.add_argument("--per-game", type=int, default=2, help="positions sampled per game")
+    parser.add_argument("--black", default=None, help="player module playing black (default: random moves)")
+    parser.add_argument("--white", default=None, help="player module playing white (default: same as black)")
+    parser.add_argument("--opening", type=int, default=4, help="random first moves of the games between players")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-j", "--processes", type=int, default=None, help="default: number of cores")
+    parser.add_argument("-v", "--verbosity", type=int, default=1)
+    args = parser.parse_args()
+
+    black = tournament.fileorpackage(args.black) if args.black else None
+    white = tournament.fileorpackage(args.white) if args.white else black
+    total = run(args.output, args.shards, args.samples, args.seed, args.processes, args.verbosity, size=args.size,
+                count=args.rollouts, per_game=args.per_game, black=black, white=white, opening=args.opening)
+    print(f"{total} samples written in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
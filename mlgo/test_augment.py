@@ -0,0 +1,11 @@
+import torch
+
+import augment
+
+
+def test_random_symmetries_picks_the_drawn_symmetry():
+    ''' Each board gets the symmetry of its draw, as taken from the 8 symmetric copies of the batch.'''
+    boards = torch.rand(100, 2, 8, 8)
+    result = augment.random_symmetries(boards, torch.Generator().manual_seed(0))
+    choice = torch.randint(8, (len(boards),), generator=torch.Generator().manual_seed(0))
+    assert torch.equal(result, augment.symmetries(boards)[choice, torch.arange(len(boards))])
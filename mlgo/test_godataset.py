@@ -0,0 +1,78 @@
+import gzip
+import json
+import os
+
+import numpy as np
+import pytest
+
+import godataset
+import selfplay
+
+
+def notebook_planes(sample):
+    ''' (2, 8, 8) planes of a sample, as built by data_to_dataset in the notebook.'''
+    planes = np.zeros((2, 8, 8), dtype=np.uint8)
+    for c, color in enumerate(("black_stones", "white_stones")):
+        for name in sample[color]:
+            planes[c, "ABCDEFGH".index(name[0]), int(name[1:]) - 1] = 1
+    return planes
+
+
+@pytest.fixture(scope="module")
+def samples():
+    return selfplay.generate(6, 0, count=10)
+
+
+def test_pack_empty():
+    ''' No samples: empty columns of the dtypes and widths of a non empty pack.'''
+    sample = {name: 1 for name in godataset.LABELS}
+    sample.update(black_stones=["A1"], white_stones=["B2"], list_of_moves=["A1", "B2"])
+    for size in (7, 8, 9):
+        planes, labels, moves, moves_index = godataset.pack([], size)
+        reference = godataset.pack([sample], size)
+        assert planes.shape == (0, reference[0].shape[1]) and planes.dtype == reference[0].dtype
+        assert all(labels[name].shape == (0,) and labels[name].dtype == np.int32 for name in godataset.LABELS)
+        assert moves.shape == (0,) and moves.dtype == np.int8
+        assert moves_index.tolist() == [0] and moves_index.dtype == np.int64
+
+
+def test_convert_empty_shard(tmp_path):
+    ''' An empty shard gives an empty dataset that can be loaded.'''
+    shard = os.path.join(tmp_path, "empty.jsonl.gz")
+    with gzip.open(shard, "wt"):
+        pass
+    directory = os.path.join(tmp_path, "packed")
+    assert godataset.convert(shard, directory, verbosity=0) == 0
+    dataset = godataset.load(directory)
+    assert len(dataset) == 0
+    assert dataset.planes.shape == (0, 16)
+
+
+def test_pack_unpack(samples):
+    ''' Self-play samples packed then unpacked give the planes of data_to_dataset, the labels and the moves.'''
+    planes, labels, moves, moves_index = godataset.pack(samples)
+    unpacked = godataset.unpack(planes)
+    for k, sample in enumerate(samples):
+        assert (unpacked[k] == notebook_planes(sample)).all()
+        assert all(labels[name][k] == sample[name] for name in godataset.LABELS)
+        assert moves[moves_index[k]:moves_index[k + 1]].tolist() == [godataset.flat_of_name(m, 8)
+                                                                     for m in sample["list_of_moves"]]
+
+
+def test_convert_load(tmp_path, samples):
+    ''' A shard converted then memory-mapped gives back the labels, the planes and the targets of its samples.'''
+    shard = os.path.join(tmp_path, "shard.jsonl.gz")
+    with gzip.open(shard, "wt") as f:
+        for sample in samples:
+            f.write(json.dumps(sample) + "\n")
+    directory = os.path.join(tmp_path, "packed")
+    assert godataset.convert(shard, directory, chunk=4, verbosity=0) == len(samples)
+    dataset = godataset.load(directory)
+    assert isinstance(dataset.planes, np.memmap) and len(dataset) == len(samples)
+    for name in godataset.LABELS:
+        assert dataset.labels[name].tolist() == [sample[name] for sample in samples]
+    boards, targets = dataset.tensors
+    for k, sample in enumerate(samples):
+        assert (boards[k].numpy() == notebook_planes(sample)).all()
+        assert targets[k, 0] == pytest.approx(sample["black_wins"] / sample["rollouts"])
+        assert dataset.game_moves(k).tolist() == [godataset.flat_of_name(m, 8) for m in sample["list_of_moves"]]
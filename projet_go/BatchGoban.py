@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+''' Vectorised engine playing K independent games of GO at once, for random playouts and data generation.
+
+    The K boards are the rows of a (K, size*size) int8 array (same cells and flat moves as Goban.Board), and each
+    call to play() advances all the games by one move with numpy operations only:
+    - each stone is labelled by its string (the label of one of its stones): a new stone takes the smallest label
+      of the strings of its color around it, and these strings are relabelled with it,
+    - each string keeps the count, sum and sum of squares of the points e of its (stone, empty neighbor e) pairs.
+      They are updated only around the move and the captured stones, and tell if the string has 0 liberties (no
+      pair), 1 (all the pairs have the same e, count * sum(e**2) == sum(e)**2) or more. That is enough for the
+      rules: strings of the opponent around the move with one liberty are captured, and an empty point is a
+      suicide if it has no empty neighbor, captures nothing and all the strings of the player around it have it
+      as last liberty,
+    - the superKo is checked in a per game open addressing hash set of the seen hashes (same Zobrist hashes as
+      Goban.Board),
+    - the scores are computed by Goban.Board.count_areas_batch.
+
+    The games follow the rules of Goban.Board: a move refused for superKo is not played (play() returns False for
+    this game, as push_lazy) and the game stops after two consecutive passes. A game also stops after max_moves
+    accepted moves. Coins (Goban._COIN_) are not supported. Goban.Board._BOARDSIZE must be the size of the games
+    while they are played.
+
+    boards = BatchGoban.BatchBoards(1000)
+    scores = boards.playout(np.random.default_rng(0))   --> (1000, 2) array of (black, white) area scores
+'''
+
+import numpy as np
+
+import Goban
+
+Board = Goban.Board
+
+
+def _pairs(points):
+    ''' (3, ...) count, sum and square terms of the (stone, empty point) pairs of the points.'''
+    points = points.astype(np.int64)
+    return np.stack([np.ones_like(points), points, points * points])
+
+
+def _distinct(labels):
+    ''' (K, 4) labels with -1 in place of the repeated ones of each row.'''
+    labels = labels.copy()
+    for j in range(1, labels.shape[1]):
+        labels[(labels[:, :j] == labels[:, j:j + 1]).any(axis=1), j] = -1
+    return labels
+
+
+class BatchBoards:
+    ''' K games of GO played together.'''
+
+    def __init__(self, games, max_moves=400):
+        self._size = Board._BOARDSIZE
+        n = self._n = self._size ** 2
+        self._table = Board._neighbors_tables()[1] # (n, 4), padded with the sentinel n
+        reference = Board()
+        self._positionHashes = np.ascontiguousarray(reference._positionHashes.T) # (2, n): [color - 1, fcoord]
+        self._passHashes = np.array([0, reference._passHashB, reference._passHashW], dtype=np.int64)
+
+        self.games = games
+        self.board = np.zeros((games, n), dtype=np.int8)
+        self.hashes = np.full(games, reference._currentHash, dtype=np.int64)
+        self.nextPlayer = np.full(games, Board._BLACK, dtype=np.int8)
+        self.lastPlayerHasPassed = np.zeros(games, dtype=bool)
+        self.gameOver = np.zeros(games, dtype=bool)
+        self.capturedBLACK = np.zeros(games, dtype=np.int32)
+        self.capturedWHITE = np.zeros(games, dtype=np.int32)
+        self.moves = np.zeros(games, dtype=np.int32) # number of accepted moves (passes included)
+        self._maxMoves = max_moves
+        self._seen = self._hash_sets(games, max_moves)
+        self._labels = np.full((games, n), n, dtype=np.intp) # string of each stone (one of its stones), n if empty
+        # [count, sum, squares] of the (stone, empty neighbor) pairs of the string of each label, 0 for the others
+        self._strings = np.zeros((3, games, n + 1), dtype=np.int64)
+
+    @classmethod
+    def from_boards(cls, boards, repeats=1, max_moves=400):
+        ''' BatchBoards starting from the positions of Goban.Board boards (same size), each one repeated in
+        repeats consecutive games (for the rollouts of a position). The superKo history of the boards is kept, and
+        max_moves more moves can be accepted in each game.'''
+        histories = [np.array(list(b._seenHashes), dtype=np.int64) for b in boards]
+        longest = max((len(h) for h in histories), default=0)
+        batch = cls(len(boards) * repeats, max_moves)
+        n = batch._n
+        batch._seen = batch._hash_sets(batch.games, longest + max_moves)
+        for i, b in enumerate(boards):
+            rows = np.arange(i * repeats, (i + 1) * repeats)
+            roots = np.arange(n) # label of each stone: the root of its string in the union find of b
+            parents = b._stringUnionFind.astype(np.intp)
+            while (parents[roots] >= 0).any():
+                roots = np.where(parents[roots] >= 0, parents[roots], roots)
+            batch.board[rows] = b._board
+            batch._labels[rows] = np.where(b._board != Board._EMPTY, roots, n)
+            batch.hashes[rows] = b._currentHash
+            batch.nextPlayer[rows] = b._nextPlayer
+            batch.lastPlayerHasPassed[rows] = b._lastPlayerHasPassed
+            batch.gameOver[rows] = b._gameOver
+            batch.capturedBLACK[rows] = b._capturedBLACK
+            batch.capturedWHITE[rows] = b._capturedWHITE
+            for h in histories[i]:
+                batch._seen_add(rows, np.full(len(rows), h))
+        batch._strings = batch._string_pairs(batch.board, batch._labels)
+        return batch
+
+    ##########################################################
+    ''' Seen hashes (superKo)'''
+
+    @staticmethod
+    def _hash_sets(games, capacity):
+        ''' (games, T) empty hash sets (0 is the empty slot) for capacity hashes, T being a power of 2 at least
+        twice as large so that the probes stay short.'''
+        size = 1
+        while size < 2 * capacity:
+            size *= 2
+        return np.zeros((games, size), dtype=np.int64)
+
+    def _probe(self, games, hashes):
+        ''' Slots of the hashes in the sets of the games (linear probing), and whether they were found there (else
+        the slot is the empty one where it goes).'''
+        mask = self._seen.shape[1] - 1
+        slots = (hashes & mask).astype(np.intp)
+        found = np.zeros(len(games), dtype=bool)
+        pending = np.arange(len(games))
+        while len(pending):
+            values = self._seen[games[pending], slots[pending]]
+            hit = values == hashes[pending]
+            found[pending[hit]] = True
+            pending = pending[~hit & (values != 0)]
+            slots[pending] = (slots[pending] + 1) & mask
+        return slots, found
+
+    def _seen_add(self, games, hashes):
+        ''' Adds one hash to the set of each of the (distinct) games.'''
+        slots, found = self._probe(games, hashes)
+        self._seen[games[~found], slots[~found]] = hashes[~found]
+
+    ##########################################################
+    ''' Strings and liberties of all the boards'''
+
+    def _string_pairs(self, board, labels):
+        ''' (3, K, n + 1) [count, sum, squares] of the (stone, empty neighbor e) pairs of each string, by label,
+        computed from scratch (see _strings).'''
+        K, n = board.shape
+        table = self._table
+        empty = board == Board._EMPTY
+        pairs = np.concatenate([empty, np.zeros((K, 1), dtype=bool)], axis=1)[:, table] # (K, n, 4)
+        pairs[empty] = False
+        k, stone, d = np.nonzero(pairs)
+        keys = k * (n + 1) + labels[k, stone]
+        liberty = table[stone, d].astype(np.float64)
+        length = K * (n + 1)
+        return np.stack([np.bincount(keys, minlength=length), np.bincount(keys, weights=liberty, minlength=length),
+                         np.bincount(keys, weights=liberty * liberty, minlength=length)]
+                        ).astype(np.int64).reshape(3, K, n + 1)
+
+    @staticmethod
+    def _liberty_classes(count, total, squares):
+        ''' Liberties clipped to 2 (0, 1 or "at least 2") of strings given by their pairs.'''
+        return np.where(count == 0, 0, np.where(count * squares == total * total, 1, 2))
+
+    def _liberties(self, games):
+        ''' (len(games), n) liberties of the string of each stone, clipped to 2, and 0 for the empty points.'''
+        classes = self._liberty_classes(*self._strings[:, games])
+        return np.take_along_axis(classes, self._labels[games], axis=1)
+
+    def _add_pairs(self, keys, pairs):
+        ''' Adds the (3, m) pairs to the strings of the flat keys (game * (n + 1) + label).'''
+        strings = self._strings.reshape(3, -1)
+        for i in range(3):
+            np.add.at(strings[i], keys, pairs[i])
+
+    @staticmethod
+    def _has_label(labels, selected):
+        ''' (K, n) booleans of the stones whose label is one of the (K, 4) selected labels (-1 for none).'''
+        K, n = labels.shape
+        flags = np.zeros((K, n + 2), dtype=bool) # n is the label of the empty points, n + 1 stands for -1
+        flags[np.arange(K)[:, None], np.where(selected >= 0, selected, n + 1)] = True
+        flags[:, n:] = False
+        return np.take_along_axis(flags, labels, axis=1)
+
+    def _around(self, moves, *arrays):
+        ''' Values of the arrays ((K, n) each) on the (K, 4) neighbors of the moves, -1 outside of the board.'''
+        K = len(moves)
+        neighbors = self._table[moves]
+        rows = np.arange(K)[:, None]
+        return [np.concatenate([a, np.full((K, 1), -1, dtype=a.dtype)], axis=1)[rows, neighbors] for a in arrays]
+
+    ##########################################################
+    ''' Moves'''
+
+    def legal_mask(self):
+        ''' (K, n) booleans of the empty points that are not suicides for the next player of each game (the moves
+        of weak_legal_moves, pass excepted). All False for the games that are over.'''
+        legal = np.zeros(self.board.shape, dtype=bool)
+        games = np.flatnonzero(~self.gameOver)
+        legal[games] = self._legal(games)
+        return legal
+
+    def _legal(self, games):
+        ''' legal_mask() of the given games only.'''
+        table = self._table
+        board = self.board[games]
+        color = self.nextPlayer[games][:, None, None]
+        opponent = 3 - color
+        wall = np.full((len(games), 1), -1, dtype=board.dtype)
+        cells = np.concatenate([board, wall], axis=1)[:, table] # (games, n, 4)
+        libs = np.concatenate([self._liberties(games), wall], axis=1)[:, table]
+        legal = (cells == Board._EMPTY).any(axis=2) # an empty neighbor
+        legal |= ((cells == opponent) & (libs == 1)).any(axis=2) # captures (this point is their last liberty)
+        legal |= ((cells == color) & (libs == 2)).any(axis=2) # connects to a string with another liberty
+        legal &= board == Board._EMPTY
+        return legal
+
+    def play(self, moves):
+        ''' Plays moves[k] (a flat move or -1 for pass) in each game k that is not over. The stones must be put on
+        points of legal_mask(). Returns the (K,) booleans given by push_lazy: False if the move was refused for
+        superKo (the game is unchanged), True otherwise (and for the games that are over).
+
+        Only the games where a stone is put are computed, and only around the move: the strings of the opponent
+        with one liberty (the move) are captured, and those of the player are merged with the new stone (with the
+        smallest of their labels). The pairs of the strings are then updated: the move is no longer an empty
+        neighbor, the new stone brings its empty neighbors, and the captured stones become empty neighbors of the
+        stones around them.'''
+        moves = np.asarray(moves)
+        n = self._n
+        active = ~self.gameOver & (self.moves < self._maxMoves)
+        games = np.flatnonzero(active & (moves >= 0))
+        passing = np.flatnonzero(active & (moves < 0))
+        refused = np.zeros(self.games, dtype=bool)
+
+        if len(games):
+            move = moves[games]
+            color = self.nextPlayer[games]
+            opponent = 3 - color
+            board = self.board[games]
+            oldLabels = self._labels[games]
+            cells, labels = self._around(move, board, oldLabels)
+            strings = self._strings[:, games[:, None], np.where(labels >= 0, labels, n)]
+            libs = self._liberty_classes(*strings)
+            captureLabels = np.where((cells == opponent[:, None]) & (libs == 1), labels, -1)
+            mergeLabels = np.where(cells == color[:, None], labels, -1)
+            newLabel = np.minimum(np.where(mergeLabels >= 0, mergeLabels, n).min(axis=1), move)
+            captured = self._has_label(oldLabels, captureLabels)
+
+            hashes = self.hashes[games] ^ self._positionHashes[color - 1, move]
+            hashes ^= np.bitwise_xor.reduce(np.where(captured, self._positionHashes[opponent - 1], 0), axis=1)
+            ok = ~self._probe(games, hashes)[1]
+            refused[games[~ok]] = True
+
+            games, move, color, opponent, board, oldLabels, cells, labels, captureLabels, mergeLabels, newLabel, \
+                captured, hashes = (a[ok] for a in (games, move, color, opponent, board, oldLabels, cells, labels,
+                captureLabels, mergeLabels, newLabel, captured, hashes))
+            rows = np.arange(len(games))
+            merged = self._has_label(oldLabels, mergeLabels)
+            merged[rows, move] = True
+            board[rows, move] = color
+            board[captured] = Board._EMPTY
+            newLabels = np.where(merged, newLabel[:, None], np.where(captured, n, oldLabels))
+
+            base = games * (n + 1)
+            newKeys = base + newLabel
+            # the move is no longer an empty neighbor of the stones around it
+            stones = cells > 0
+            self._add_pairs((base[:, None] + labels)[stones],
+                            -_pairs(np.broadcast_to(move[:, None], cells.shape)[stones]))
+            # the merged strings go to the new label, the captured ones are removed
+            strings = self._strings.reshape(3, -1)
+            mergeLabels = _distinct(mergeLabels)
+            selected = (mergeLabels >= 0) & (mergeLabels != newLabel[:, None])
+            sources = (base[:, None] + mergeLabels)[selected]
+            self._add_pairs(np.broadcast_to(newKeys[:, None], selected.shape)[selected], strings[:, sources])
+            strings[:, sources] = 0
+            captureLabels = _distinct(captureLabels)
+            strings[:, (base[:, None] + captureLabels)[captureLabels >= 0]] = 0
+            # the empty neighbors of the new stone
+            empties = cells == Board._EMPTY
+            points = self._table[move][empties]
+            self._add_pairs(np.broadcast_to(newKeys[:, None], empties.shape)[empties], _pairs(points))
+            # the captured stones are empty neighbors of the stones around them
+            r, stone = np.nonzero(captured)
+            if len(r):
+                around = self._table[stone]
+                wall = np.full((len(games), 1), -1, dtype=np.intp)
+                stoneLabels = np.where(board != Board._EMPTY, newLabels, -1)
+                aroundLabels = np.concatenate([stoneLabels, wall], axis=1)[r[:, None], around]
+                stones = aroundLabels >= 0
+                self._add_pairs((base[r][:, None] + aroundLabels)[stones],
+                                _pairs(np.broadcast_to(stone[:, None], around.shape)[stones]))
+
+            nbCaptured = captured.sum(axis=1)
+            self.board[games] = board
+            self._labels[games] = newLabels
+            self.hashes[games] = hashes
+            self.capturedBLACK[games] += np.where(opponent == Board._BLACK, nbCaptured, 0).astype(np.int32)
+            self.capturedWHITE[games] += np.where(opponent == Board._WHITE, nbCaptured, 0).astype(np.int32)
+            self.lastPlayerHasPassed[games] = False
+
+        if len(passing):
+            self.gameOver[passing] |= self.lastPlayerHasPassed[passing]
+            self.lastPlayerHasPassed[passing] = True
+            self.hashes[passing] ^= self._passHashes[self.nextPlayer[passing]]
+
+        played = np.concatenate([games, passing])
+        self._seen_add(played, self.hashes[played])
+        self.moves[played] += 1
+        self.nextPlayer[played] = 3 - self.nextPlayer[played]
+        return ~refused
+
+    def random_moves(self, rng):
+        ''' One move per game, chosen uniformly among the points of legal_mask() and pass (as
+        rng.choice(board.weak_legal_moves()) for a Goban.Board). -1 for the games that are over.'''
+        moves = np.full(self.games, -1)
+        games = np.flatnonzero(~self.gameOver & (self.moves < self._maxMoves))
+        legal = self._legal(games)
+        counts = legal.sum(axis=1)
+        choice = (rng.random(len(games)) * (counts + 1)).astype(np.intp) # counts is pass
+        index = np.argmax(np.cumsum(legal, axis=1) > choice[:, None], axis=1)
+        moves[games] = np.where(choice < counts, index, -1)
+        return moves
+
+    def playout(self, rng):
+        ''' Plays random moves in all the games until they are over (or max_moves moves were accepted, as
+        bench.random_playout) and returns their scores.'''
+        while (~self.gameOver & (self.moves < self._maxMoves)).any():
+            self.play(self.random_moves(rng))
+        return self.compute_score()
+
+    ##########################################################
+    ''' Scores'''
+
+    def nb_stones(self):
+        ''' (K, 2) numbers of black and white stones on the boards.'''
+        return np.stack([(self.board == Board._BLACK).sum(axis=1), (self.board == Board._WHITE).sum(axis=1)],
+                        axis=1)
+
+    def compute_score(self):
+        ''' (K, 2) scores (chinese rules) of (blacks, whites), as Goban.Board.compute_score().'''
+        return self.nb_stones() + Board.count_areas_batch(self.board)[:, :2]
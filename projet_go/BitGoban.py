@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+''' Alternative engine for Goban.Board where the stones are stored as bit masks (Python big ints).
+
+    The board is stored row by row with one extra (always empty) column, so a shift by 1 never wraps a stone
+    from one row to the next one. With these masks, the neighbors of a whole string are
+    ((m << 1) | (m >> 1) | (m << W) | (m >> W)) & ON, flood fills are a few of these operations and captures
+    are just and/or of masks.
+
+    BitBoard has the same public API as Goban.Board (push, pop, push_lazy, legal_moves, weak_legal_moves,
+    compute_score, result, ...), the same flat moves and the same Zobrist hashes, so the players can use one or
+    the other. Coins (Goban._COIN_) are not supported.
+'''
+
+import numpy as np
+
+import Goban
+
+
+class BitBoard:
+    ''' GO Board where black and white stones are stored as bit masks.'''
+
+    _BLACK = Goban.Board._BLACK
+    _WHITE = Goban.Board._WHITE
+    _EMPTY = Goban.Board._EMPTY
+
+    # Same helpers as in Goban.Board for the moves and the players
+    flatten = staticmethod(Goban.Board.flatten)
+    unflatten = staticmethod(Goban.Board.unflatten)
+    name_to_coord = staticmethod(Goban.Board.name_to_coord)
+    name_to_flat = staticmethod(Goban.Board.name_to_flat)
+    coord_to_name = staticmethod(Goban.Board.coord_to_name)
+    flat_to_name = staticmethod(Goban.Board.flat_to_name)
+    flip = staticmethod(Goban.Board.flip)
+    player_name = staticmethod(Goban.Board.player_name)
+
+    _tables = {} # Precomputed masks and hashes, by board size
+
+    @staticmethod
+    def _get_tables(size):
+        ''' Builds (once per size) the masks and the Zobrist values, taken from a Goban.Board so that the hashes
+        of the two engines are the same.'''
+        if size in BitBoard._tables:
+            return BitBoard._tables[size]
+        width = size + 1
+        flatToBit = [(f // size) * width + f % size for f in range(size * size)]
+        bitToFlat = {}
+        on = 0
+        for f, b in enumerate(flatToBit):
+            bitToFlat[b] = f
+            on |= 1 << b
+        reference = Goban.Board()
+        hashes = [[0] * (width * size) for _ in range(3)] # hashes[color][bit]
+        for f, b in enumerate(flatToBit):
+            for color in (BitBoard._BLACK, BitBoard._WHITE):
+                hashes[color][b] = int(reference._positionHashes[f][color - 1])
+        tables = (width, on, flatToBit, bitToFlat, hashes, int(reference._currentHash), int(reference._passHashB),
+                  int(reference._passHashW))
+        BitBoard._tables[size] = tables
+        return tables
+
+    def __init__(self, other=None):
+        ''' Main constructor. If other is given, copies it (but not its push/pop stack, as in Goban.Board).'''
+        if other is None:
+            self._reset()
+        else:
+            self._copy(other)
+
+    def _reset(self):
+        self._size = Goban.Board._BOARDSIZE
+        (self._width, self._on, self._flatToBit, self._bitToFlat, self._hashes, self._currentHash,
+            self._passHashB, self._passHashW) = BitBoard._get_tables(self._size)
+        self._blacks = 0
+        self._whites = 0
+        self._nbBLACK = 0
+        self._nbWHITE = 0
+        self._capturedBLACK = 0
+        self._capturedWHITE = 0
+        self._nextPlayer = self._BLACK
+        self._lastPlayerHasPassed = False
+        self._gameOver = False
+        self._seenHashes = Goban.SeenHashes()
+        self._historyMoveNames = []
+        self._trailMoves = []
+
+    def _copy(self, other):
+        (self._size, self._width, self._on, self._flatToBit, self._bitToFlat, self._hashes, self._passHashB,
+            self._passHashW) = (other._size, other._width, other._on, other._flatToBit, other._bitToFlat,
+            other._hashes, other._passHashB, other._passHashW)
+        self._blacks = other._blacks
+        self._whites = other._whites
+        self._nbBLACK = other._nbBLACK
+        self._nbWHITE = other._nbWHITE
+        self._capturedBLACK = other._capturedBLACK
+        self._capturedWHITE = other._capturedWHITE
+        self._nextPlayer = other._nextPlayer
+        self._lastPlayerHasPassed = other._lastPlayerHasPassed
+        self._gameOver = other._gameOver
+        self._currentHash = other._currentHash
+        self._seenHashes = other._seenHashes.fork()
+        self._historyMoveNames = []
+        self._trailMoves = []
+
+    def reset(self):
+        self._reset()
+
+    ##########################################################
+    ##########################################################
+    ''' Mask helpers'''
+
+    def _neighbors(self, mask):
+        w = self._width
+        return ((mask << 1) | (mask >> 1) | (mask << w) | (mask >> w)) & self._on
+
+    def _flood(self, seed, within):
+        ''' Grows seed inside the mask within until it is stable (the string or the area containing seed).'''
+        w = self._width
+        on = self._on
+        while True:
+            grown = (seed | (seed << 1) | (seed >> 1) | (seed << w) | (seed >> w)) & within
+            if grown == seed:
+                return seed
+            seed = grown & on
+
+    def _empties(self):
+        return self._on & ~(self._blacks | self._whites)
+
+    def _stones(self, color):
+        return self._blacks if color == self._BLACK else self._whites
+
+    def _mask_hash(self, mask, color):
+        h = 0
+        hashes = self._hashes[color]
+        while mask:
+            low = mask & -mask
+            h ^= hashes[low.bit_length() - 1]
+            mask ^= low
+        return h
+
+    def _mask_to_flats(self, mask):
+        flats = []
+        bitToFlat = self._bitToFlat
+        while mask:
+            low = mask & -mask
+            flats.append(bitToFlat[low.bit_length() - 1])
+            mask ^= low
+        return flats
+
+    def _captures(self, bit, color):
+        ''' Mask of the opponent stones captured if color plays on bit.'''
+        opponent = self._whites if color == self._BLACK else self._blacks
+        empties = self._empties() & ~bit
+        captured = 0
+        around = self._neighbors(bit) & opponent
+        while around:
+            string = self._flood(around & -around, opponent)
+            if self._neighbors(string) & empties == 0:
+                captured |= string
+            around &= ~string
+        return captured
+
+    ##########################################################
+    ##########################################################
+    ''' Same public API as Goban.Board'''
+
+    def __getitem__(self, key):
+        bit = 1 << self._flatToBit[key]
+        if self._blacks & bit:
+            return self._BLACK
+        if self._whites & bit:
+            return self._WHITE
+        return self._EMPTY
+
+    def __len__(self):
+        return self._size ** 2
+
+    def get_board(self):
+        ''' Returns a numpy array with the same values as Goban.Board.get_board() (it is built on each call).'''
+        board = np.zeros(self._size ** 2, dtype='int8')
+        board[self._mask_to_flats(self._blacks)] = self._BLACK
+        board[self._mask_to_flats(self._whites)] = self._WHITE
+        return board
+
+    _board = property(get_board) # Used by the printing functions borrowed from Goban.Board
+
+    def is_game_over(self):
+        return self._gameOver
+
+    def next_player(self):
+        return self._nextPlayer
+
+    def _strings(self, stones):
+        ''' Splits the mask stones into strings. Returns the mask of the strings with only one liberty (atari),
+        the mask of the other strings, and a dict giving, for each single liberty, the mask of the strings in
+        atari on it.'''
+        empties = self._empties()
+        atari = 0
+        atariOn = {}
+        remaining = stones
+        while remaining:
+            string = self._flood(remaining & -remaining, stones)
+            remaining &= ~string
+            liberties = self._neighbors(string) & empties
+            if liberties and liberties & (liberties - 1) == 0: # only one liberty
+                atari |= string
+                atariOn[liberties] = atariOn.get(liberties, 0) | string
+        return atari, stones & ~atari, atariOn
+
+    def _suicide_free(self, color, opponentAtari=None):
+        ''' Mask of the empty points that are not suicides for color. An empty point with an empty neighbor is
+        never a suicide. The other ones must be next to a friend string with another liberty, or next to an
+        opponent string in atari (which is then captured).'''
+        empties = self._empties()
+        free = empties & self._neighbors(empties)
+        enclosed = empties & ~free
+        if enclosed:
+            friends = self._stones(color)
+            opponents = self._stones(Goban.Board.flip(color))
+            if opponentAtari is None:
+                opponentAtari = self._strings(opponents)[0]
+            friendsSafe = self._strings(friends)[1]
+            free |= enclosed & self._neighbors(friendsSafe | opponentAtari)
+        return free
+
+    def weak_legal_moves(self):
+        ''' See Goban.Board.weak_legal_moves (superKo are not checked).'''
+        moves = self._mask_to_flats(self._suicide_free(self._nextPlayer))
+        moves.append(-1)
+        return moves
+
+    def legal_moves(self):
+        ''' See Goban.Board.legal_moves. The hash after a move is cheap here: only the moves on the single liberty
+        of opponent strings in atari can capture, and these strings are computed once.'''
+        color = self._nextPlayer
+        opponent = Goban.Board.flip(color)
+        opponentAtari, _, capturesOn = self._strings(self._stones(opponent))
+        hashes = self._hashes[color]
+        moves = []
+        candidates = self._suicide_free(color, opponentAtari)
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            b = bit.bit_length() - 1
+            h = self._currentHash ^ hashes[b]
+            if bit in capturesOn:
+                h ^= self._mask_hash(capturesOn[bit], opponent)
+            if h not in self._seenHashes:
+                moves.append(self._bitToFlat[b])
+        moves.append(-1)
+        return moves
+
+    def generate_legal_moves(self):
+        return self.legal_moves()
+
+    def move_to_str(self, m):
+        return BitBoard.flat_to_name(m)
+
+    def str_to_move(self, s):
+        return BitBoard.name_to_flat(s)
+
+    def play_move(self, fcoord):
+        ''' See Goban.Board.play_move. Returns False (and does nothing) if the move is a superKo.'''
+        if self._gameOver:
+            return True
+        color = self._nextPlayer
+        if fcoord != -1:
+            b = self._flatToBit[fcoord]
+            bit = 1 << b
+            captured = self._captures(bit, color)
+            opponent = Goban.Board.flip(color)
+            h = self._currentHash ^ self._hashes[color][b]
+            if captured:
+                h ^= self._mask_hash(captured, opponent)
+            if h in self._seenHashes:
+                self._historyMoveNames.append(self.flat_to_name(fcoord))
+                return False
+            nbCaptured = captured.bit_count()
+            if color == self._BLACK:
+                self._blacks |= bit
+                self._whites &= ~captured
+                self._nbBLACK += 1
+                self._nbWHITE -= nbCaptured
+                self._capturedWHITE += nbCaptured
+            else:
+                self._whites |= bit
+                self._blacks &= ~captured
+                self._nbWHITE += 1
+                self._nbBLACK -= nbCaptured
+                self._capturedBLACK += nbCaptured
+            self._currentHash = h
+            self._lastPlayerHasPassed = False
+        else:
+            if self._lastPlayerHasPassed:
+                self._gameOver = True
+            else:
+                self._lastPlayerHasPassed = True
+            self._currentHash ^= self._passHashB if color == self._BLACK else self._passHashW
+
+        self._seenHashes.add(self._currentHash)
+        self._historyMoveNames.append(self.flat_to_name(fcoord))
+        self._nextPlayer = Goban.Board.flip(color)
+        return True
+
+    def push(self, m):
+        assert not self._gameOver
+        self._trailMoves.append((self._blacks, self._whites, self._nbBLACK, self._nbWHITE, self._capturedBLACK,
+            self._capturedWHITE, self._nextPlayer, self._lastPlayerHasPassed, self._gameOver, self._currentHash))
+        return self.play_move(m)
+
+    def push_lazy(self, m):
+        assert not self._gameOver
+        return self.play_move(m)
+
+    def pop(self):
+        hashtopop = self._currentHash
+        (self._blacks, self._whites, self._nbBLACK, self._nbWHITE, self._capturedBLACK, self._capturedWHITE,
+            self._nextPlayer, self._lastPlayerHasPassed, self._gameOver, self._currentHash) = self._trailMoves.pop()
+        self._historyMoveNames.pop()
+        if hashtopop != self._currentHash: # else the move was refused (superKo) and added no hash
+            self._seenHashes.remove(hashtopop)
+
+    def _breadthSearchString(self, fc):
+        ''' Set of the flat coordinates of the string containing the stone fc.'''
+        bit = 1 << self._flatToBit[fc]
+        stones = self._blacks if self._blacks & bit else self._whites
+        return set(self._mask_to_flats(self._flood(bit, stones)))
+
+    def _count_areas(self):
+        ''' Same as Goban.Board._count_areas: number of empty positions that only reach respectively BLACK and
+        WHITE stones (and the ones touching both colours), each empty area being a single flood fill.'''
+        only_blacks = 0
+        only_whites = 0
+        others = 0
+        empties = self._empties()
+        remaining = empties
+        while remaining:
+            area = self._flood(remaining & -remaining, empties)
+            remaining &= ~area
+            border = self._neighbors(area)
+            touched_blacks = border & self._blacks
+            touched_whites = border & self._whites
+            if not touched_blacks and touched_whites:
+                only_whites += area.bit_count()
+            elif not touched_whites and touched_blacks:
+                only_blacks += area.bit_count()
+            else:
+                others += area.bit_count()
+        return (only_blacks, only_whites, others)
+
+    # The scoring and printing functions only use the counters, _count_areas and _board
+    _result = Goban.Board._result
+    result = Goban.Board.result
+    result_number = Goban.Board.result_number
+    winner = Goban.Board.winner
+    compute_score = Goban.Board.compute_score
+    diff_stones_board = Goban.Board.diff_stones_board
+    diff_stones_captured = Goban.Board.diff_stones_captured
+    final_go_score = Goban.Board.final_go_score
+    _piece2str = Goban.Board._piece2str
+    __str__ = Goban.Board.__str__
+    pretty_print = Goban.Board.pretty_print
+    prettyPrint = Goban.Board.prettyPrint
+    _draw_cross = Goban.Board._draw_cross
+    svg = Goban.Board.svg
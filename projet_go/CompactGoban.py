@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+''' Variant of Goban.Board with cheap copies, for the search algorithms that copy the board at each root move or
+each simulation.
+
+    - The four int8 arrays (_board, _stringUnionFind, _stringLiberties, _stringSizes) are views on one buffer, so
+      copying them, or snapshotting them for push/pop, is a single memcpy.
+    - The set of the empty points is not kept (the empty points are the zeros of _board).
+
+    CompactBoard is a Goban.Board (same methods, same hashes), and can be built from a Goban.Board:
+
+    board = CompactGoban.CompactBoard(goban_board)
+'''
+
+import numpy as np
+
+import Goban
+
+Board = Goban.Board
+
+
+class EmptyPoints:
+    ''' Stands for Board._empties, read from the board: the updates done by the Goban.Board methods are ignored.'''
+
+    __slots__ = ("_cells",)
+
+    def __init__(self, cells):
+        self._cells = cells
+
+    def add(self, fcoord):
+        pass
+
+    remove = discard = add
+
+    def __contains__(self, fcoord):
+        return self._cells[fcoord] == Board._EMPTY
+
+    def __iter__(self):
+        return iter(np.flatnonzero(self._cells == Board._EMPTY).tolist())
+
+    def __len__(self):
+        return int(np.count_nonzero(self._cells == Board._EMPTY))
+
+    def copy(self):
+        ''' A plain set of the empty points, as Board._shallow_copy expects from _empties.'''
+        return set(self)
+
+
+class CompactBoard(Board):
+    ''' Goban.Board with its arrays in one buffer.'''
+
+    # The attributes of the board in slots (Goban.Board keeps its __dict__, external code may add attributes)
+    __slots__ = ("_state", "_nbWHITE", "_nbBLACK", "_capturedWHITE", "_capturedBLACK", "_nextPlayer", "_board",
+                 "_empties", "_lastPlayerHasPassed", "_gameOver", "_trailMoves", "_stringUnionFind",
+                 "_stringLiberties", "_stringSizes", "_positionHashes", "_currentHash", "_passHashB", "_passHashW",
+                 "_symPositionHashes", "_symHashes", "_seenHashes", "_historyMoveNames", "_suicideFreeBLACK",
+                 "_suicideFreeWHITE", "_enclosed", "_neighbors", "_neighborsEntries", "_trailUndo", "_undo",
+                 "_cells")
+
+    def _reset(self):
+        Board._reset(self)
+        self._trailUndo = False # the snapshot of push() is one memcpy, cheaper than the trail undo
+        self._cells = None
+        self._pack(self._board, self._stringUnionFind, self._stringLiberties, self._stringSizes)
+
+    def _pack(self, board, unionFind, liberties, sizes):
+        ''' Copies the four arrays in a new buffer and makes the attributes views on it.'''
+        self._state = np.concatenate((board, unionFind, liberties, sizes))
+        self._views()
+
+    def _views(self):
+        state = self._state
+        n = len(state) // 4
+        self._board = state[:n]
+        self._stringUnionFind = state[n:2 * n]
+        self._stringLiberties = state[2 * n:3 * n]
+        self._stringSizes = state[3 * n:]
+        self._empties = EmptyPoints(self._board)
+
+    def _shallow_copy(self, other):
+        if isinstance(other, CompactBoard):
+            self._state = other._state.copy()
+            self._views()
+        else: # from a Goban.Board
+            self._pack(other._board, other._stringUnionFind, other._stringLiberties, other._stringSizes)
+        self._seenHashes = other._seenHashes.fork()
+        self._nbWHITE = other._nbWHITE
+        self._nbBLACK = other._nbBLACK
+        self._capturedWHITE = other._capturedWHITE
+        self._capturedBLACK = other._capturedBLACK
+        self._nextPlayer = other._nextPlayer
+        self._gameOver = other._gameOver
+        self._lastPlayerHasPassed = other._lastPlayerHasPassed
+        self._currentHash = other._currentHash
+        self._positionHashes = other._positionHashes
+        self._symPositionHashes = other._symPositionHashes
+        self._symHashes = other._symHashes
+        self._passHashB = other._passHashB
+        self._passHashW = other._passHashW
+        self._suicideFreeBLACK = other._suicideFreeBLACK
+        self._suicideFreeWHITE = other._suicideFreeWHITE
+        self._enclosed = other._enclosed
+        self._historyMoveNames = []
+        self._neighbors = other._neighbors
+        self._neighborsEntries = other._neighborsEntries
+        self._trailMoves = None # Can be overrided right after...
+        self._trailUndo = False
+        self._undo = None
+        self._cells = None
+
+    def _pushBoard(self):
+        self._trailMoves.append((self._state.copy(), (self._nbWHITE, self._nbBLACK, self._capturedWHITE,
+            self._capturedBLACK, self._nextPlayer, self._gameOver, self._lastPlayerHasPassed, self._currentHash,
+            self._symHashes, self._suicideFreeBLACK, self._suicideFreeWHITE, self._enclosed)))
+
+    def _popBoard(self):
+        state, scalars = self._trailMoves.pop()
+        self._state[:] = state # in place: the views stay valid
+        (self._nbWHITE, self._nbBLACK, self._capturedWHITE, self._capturedBLACK, self._nextPlayer,
+            self._gameOver, self._lastPlayerHasPassed, self._currentHash, self._symHashes, self._suicideFreeBLACK,
+            self._suicideFreeWHITE, self._enclosed) = scalars
+        self._historyMoveNames.pop()
+
+    def set_state(self, state):
+        Board.set_state(self, state)
+        self._pack(self._board, self._stringUnionFind, self._stringLiberties, self._stringSizes)
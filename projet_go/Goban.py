@@ -30,6 +30,10 @@
 from __future__ import print_function # Used to help cython work well
 import numpy as np
 import random
+import copy
+import functools
+import json
+import time
 
 def getProperRandom():
     ''' Gets a proper 64 bits random number (ints in Python are not the ideal toy to play with int64)'''
@@ -37,6 +41,86 @@ def getProperRandom():
 
 _COIN_ = False 
 
+class SeenHashes:
+    ''' History of the hashes of the positions of the game, for the superKo: a counting set (hash -> number of
+    times it was added) with O(1) add, remove and lookup.
+
+    Copies of a board share their history instead of copying it: fork() freezes the hashes counted so far in a
+    parent node that is never modified again, and the board and its copy then count their new hashes in their own
+    dicts. The chains are flattened beyond _MAX_DEPTH nodes, so a lookup is at most _MAX_DEPTH + 1 dict lookups.'''
+
+    __slots__ = ("_counts", "_parent", "_depth")
+    _MAX_DEPTH = 4
+
+    def __init__(self, hashes=()):
+        self._counts = {}
+        self._parent = None
+        self._depth = 0
+        for h in hashes:
+            self.add(h)
+
+    def add(self, h):
+        counts = self._counts
+        counts[h] = counts.get(h, 0) + 1
+
+    def remove(self, h):
+        ''' Removes one occurrence of h (that must be in the history).'''
+        counts = self._counts
+        c = counts.get(h)
+        if c is None: # only in a frozen parent (popping a move pushed before the fork): stop sharing
+            self._flatten()
+            counts = self._counts
+            c = counts[h]
+        if c == 1:
+            del counts[h]
+        else:
+            counts[h] = c - 1
+
+    def __contains__(self, h):
+        if h in self._counts:
+            return True
+        node = self._parent
+        while node is not None:
+            if h in node._counts:
+                return True
+            node = node._parent
+        return False
+
+    def fork(self):
+        ''' Returns the history of a copy.'''
+        if self._counts:
+            frozen = SeenHashes()
+            if self._depth >= SeenHashes._MAX_DEPTH:
+                frozen._counts = self._merged()
+            else:
+                frozen._counts, frozen._parent, frozen._depth = self._counts, self._parent, self._depth
+            self._counts = {}
+            self._parent = frozen
+            self._depth = frozen._depth + 1
+        copy = SeenHashes()
+        copy._parent, copy._depth = self._parent, self._depth
+        return copy
+
+    def _merged(self):
+        counts = dict(self._counts)
+        node = self._parent
+        while node is not None:
+            for h, c in node._counts.items():
+                counts[h] = counts.get(h, 0) + c
+            node = node._parent
+        return counts
+
+    def _flatten(self):
+        self._counts = self._merged()
+        self._parent = None
+        self._depth = 0
+
+    def __iter__(self):
+        return iter(self._merged())
+
+    def __len__(self):
+        return len(self._merged())
+
 class Board:
     ''' GO Board class to implement your (simple) GO player.'''
 
@@ -47,6 +131,7 @@ class Board:
     _EMPTY = 0
     _BOARDSIZE = 8 # Used in static methods, do not write it
     _DEBUG = False 
+    _TRAIL_UNDO = True # push/pop record the modified cells (see _pushTrail); if False, they copy the whole state
 
     ##########################################################
     ##########################################################
@@ -138,6 +223,8 @@ class Board:
       self._gameOver = False
 
       self._trailMoves = [] # data structure used to push/pop the moves
+      self._trailUndo = Board._TRAIL_UNDO
+      self._undo = None # records of the last pushed move (trail undo only)
 
       self._stringUnionFind = np.full((Board._BOARDSIZE**2), -1, dtype='int8')
       self._stringLiberties = np.full((Board._BOARDSIZE**2), -1, dtype='int8')
@@ -155,10 +242,24 @@ class Board:
       self._passHashW = getProperRandom() 
       np.random.set_state(random_state)
 
-      self._seenHashes = set()
+      # Zobrist hashes of the stones of the 8 symmetric boards, updated with each stone like _currentHash. The
+      # array is never modified in place (a new one is built by each update), so copies can share it
+      self._symPositionHashes = self._positionHashes[Board.symmetries().T].transpose(0, 2, 1).copy()
+      self._symHashes = np.zeros(8, dtype='int64')
+
+      self._seenHashes = SeenHashes()
 
       self._historyMoveNames = []
 
+      # Bitsets (python ints, bit m for the flat move m) of the empty points that are not suicides for each color,
+      # and of the empty points with no empty neighbors. They are updated after each move, only around the
+      # changed stones (see _update_suicide_free)
+      self._suicideFreeBLACK = 0
+      for m in self._empties:
+          self._suicideFreeBLACK |= 1 << m
+      self._suicideFreeWHITE = self._suicideFreeBLACK
+      self._enclosed = 0
+
       #Building fast structures for accessing neighborhood
       self._neighbors = []
       self._neighborsEntries = []
@@ -169,6 +270,7 @@ class Board:
           self._neighbors.append(-1) # Sentinelle
       self._neighborsEntries = np.array(self._neighborsEntries, dtype='int16')
       self._neighbors = np.array(self._neighbors, dtype='int8')
+      self._set_cells()
 
     def __init__(self, other = None, deepcopy=False):
       ''' Main constructor. Instantiate all non static variables.'''
@@ -176,8 +278,11 @@ class Board:
         self._reset()
       else:
         self._shallow_copy(other)
-        if deepcopy: # Also copy the backtrack structure
-            self._trailMoves = other._trailMoves.deepcopy()
+        if deepcopy: # Also copy the backtrack structure (and the names of the moves to pop)
+            self._trailMoves = copy.deepcopy(other._trailMoves)
+            self._historyMoveNames = list(other._historyMoveNames)
+            if self._trailUndo and self._trailMoves:
+                self._undo = self._trailMoves[-1][-1]
         else:
             self._trailMoves = []
 
@@ -218,8 +323,7 @@ class Board:
         extremelly costly to check. Thus, you should use weak_legal_moves that does not check the superko and actually
         check the return value of the push() function that can return False if the move was illegal due to superKo.
         '''
-        moves = [m for m in self._empties if not self._is_suicide(m, self._nextPlayer) and 
-                not self._is_super_ko(m, self._nextPlayer)[0]]
+        moves = [m for m in self._suicide_free_moves() if not self._is_super_ko(m, self._nextPlayer)[0]]
         moves.append(-1) # We can always ask to pass
         return moves
 
@@ -230,7 +334,7 @@ class Board:
         Can generate illegal moves, but only due to Super KO position. In this generator, KO are not checked.
         If you use a move from this list, you have to check if push(m) was True or False and then immediatly pop 
         it if it is False (meaning the move was superKO.'''
-        moves = [m for m in self._empties if not self._is_suicide(m, self._nextPlayer)]
+        moves = self._suicide_free_moves()
         moves.append(-1) # We can always ask to pass
         return moves
 
@@ -267,8 +371,10 @@ class Board:
             captured = self._put_stone(fcoord, self._nextPlayer)
 
             # captured is the list of Strings that have 0 liberties
+            capturedStones = []
             for fc in captured:
-                self._capture_string(fc)
+                capturedStones.extend(self._capture_string(fc))
+            self._update_suicide_free(fcoord, capturedStones)
 
             assert tmpHash == self._currentHash
             self._lastPlayerHasPassed = False
@@ -300,7 +406,10 @@ class Board:
         push: used to push a move on the board. More costly than play_move() 
         but you can pop it after. Helper for your search tree algorithm'''
         assert not self._gameOver
-        self._pushBoard()
+        if self._trailUndo:
+            self._pushTrail()
+        else:
+            self._pushBoard()
         return self.play_move(m)
     
     def push_lazy(self, m):
@@ -316,8 +425,11 @@ class Board:
         you can undo it by calling pop
         '''
         hashtopop = self._currentHash
-        self._popBoard()
-        if hashtopop in self._seenHashes:
+        if self._trailUndo:
+            self._popTrail()
+        else:
+            self._popBoard()
+        if hashtopop != self._currentHash: # else the move was refused (superKo) and added no hash
             self._seenHashes.remove(hashtopop)
 
     ##########################################################
@@ -325,7 +437,8 @@ class Board:
 
     def _result(self):
         '''
-        The scoring mechanism is fixed but really costly. It may be not a good idea to use it as a heuristics. 
+        The scoring mechanism is fixed. It flood fills all the empty areas, so it may still be costly as a heuristics
+        (see count_areas_batch to score many boards at once).
         It is the chinese area scoring that computes the final result. It uses the same notation as in chess:
         Returns:
         - "1-0" if WHITE wins
@@ -389,6 +502,76 @@ class Board:
         ''' Returns the numpy array representing the board. Don't write in it unless you know exactly what you are doing.'''
         return self._board
 
+    def get_state(self):
+        ''' Returns a compact copy of the current position (bytes and ints only, without the move history nor the
+        push/pop structures), cheap to send to another process. Use set_state() to load it in another Board.'''
+        return (self._board.tobytes(), self._stringUnionFind.tobytes(), self._stringLiberties.tobytes(),
+                self._stringSizes.tobytes(), np.array(list(self._seenHashes), dtype='int64').tobytes(),
+                (self._nbWHITE, self._nbBLACK, self._capturedWHITE, self._capturedBLACK, self._nextPlayer,
+                 self._lastPlayerHasPassed, self._gameOver, int(self._currentHash), self._suicideFreeBLACK,
+                 self._suicideFreeWHITE, self._enclosed))
+
+    def set_state(self, state):
+        ''' Replaces the position by the one returned by get_state() (from a board of the same size). The board
+        cannot pop the previous moves after that.'''
+        board, unionFind, liberties, sizes, seenHashes, scalars = state
+        self._board = np.frombuffer(board, dtype='int8').copy()
+        self._stringUnionFind = np.frombuffer(unionFind, dtype='int8').copy()
+        self._stringLiberties = np.frombuffer(liberties, dtype='int8').copy()
+        self._stringSizes = np.frombuffer(sizes, dtype='int8').copy()
+        self._seenHashes = SeenHashes(np.frombuffer(seenHashes, dtype='int64'))
+        self._empties = set(np.flatnonzero(self._board == Board._EMPTY).tolist())
+        (self._nbWHITE, self._nbBLACK, self._capturedWHITE, self._capturedBLACK, self._nextPlayer,
+         self._lastPlayerHasPassed, self._gameOver, currentHash, self._suicideFreeBLACK, self._suicideFreeWHITE,
+         self._enclosed) = scalars
+        self._currentHash = np.int64(currentHash)
+        self._symHashes = self._compute_symmetric_hashes()
+        self._historyMoveNames = []
+        self._trailMoves = []
+        self._undo = None
+        self._set_cells()
+
+    _symmetriesTables = {} # (8, size*size) permutations of the flat coordinates, by board size
+
+    @staticmethod
+    def symmetries():
+        ''' The 8 symmetries of the square board, as a (8, size*size) array: symmetries()[s][fcoord] is the image of
+        fcoord by the symmetry s (0 is the identity).'''
+        n = Board._BOARDSIZE
+        if n not in Board._symmetriesTables:
+            last = n - 1
+            transforms = [lambda x, y: (x, y), lambda x, y: (last - x, y), lambda x, y: (x, last - y),
+                          lambda x, y: (last - x, last - y), lambda x, y: (y, x), lambda x, y: (last - y, x),
+                          lambda x, y: (y, last - x), lambda x, y: (last - y, last - x)]
+            table = np.empty((8, n * n), dtype=np.intp)
+            for s, transform in enumerate(transforms):
+                for fcoord in range(n * n):
+                    table[s, fcoord] = Board.flatten(transform(*Board.unflatten(fcoord)))
+            Board._symmetriesTables[n] = table
+        return Board._symmetriesTables[n]
+
+    def symmetric_hashes(self):
+        ''' The Zobrist hashes of the stones of the 8 symmetric boards (same order as symmetries()), maintained
+        with each move. Unlike _currentHash, they do not depend on the passes. Don't modify the returned array.'''
+        if Board._DEBUG:
+            assert (self._symHashes == self._compute_symmetric_hashes()).all()
+        return self._symHashes
+
+    def canonical_hash(self):
+        ''' The same hash for the 8 symmetric positions (the smallest of symmetric_hashes()). Use it as key to share
+        the entries of transposition tables, evaluation caches or opening books between symmetric positions.'''
+        return int(self._symHashes.min())
+
+    def canonical_symmetry(self):
+        ''' Index of the symmetry giving the canonical_hash(): moves of this board are mapped to the canonical
+        board with symmetries()[canonical_symmetry()].'''
+        return int(self._symHashes.argmin())
+
+    def _compute_symmetric_hashes(self):
+        stones = np.flatnonzero((self._board == Board._BLACK) | (self._board == Board._WHITE))
+        hashes = self._positionHashes[Board.symmetries()[:, stones], self._board[stones] - 1]
+        return np.bitwise_xor.reduce(hashes, axis=1)
+
 
     def _shallow_copy(self, other):
         ''' Copy everything but the backtrack structures (cannot pop after).
@@ -409,13 +592,21 @@ class Board:
         self._empties = other._empties.copy()
         self._currentHash = other._currentHash
         self._positionHashes = other._positionHashes
+        self._symPositionHashes = other._symPositionHashes
+        self._symHashes = other._symHashes
         self._passHashB = other._passHashB
         self._passHashW = other._passHashW
-        self._seenHashes = other._seenHashes.copy()
+        self._seenHashes = other._seenHashes.fork() # shared, not copied
+        self._suicideFreeBLACK = other._suicideFreeBLACK
+        self._suicideFreeWHITE = other._suicideFreeWHITE
+        self._enclosed = other._enclosed
         self._historyMoveNames = []
         self._neighbors = other._neighbors
         self._neighborsEntries = other._neighborsEntries
         self._trailMoves = None # Can be overrided right after...
+        self._trailUndo = other._trailUndo
+        self._undo = None
+        self._set_cells()
 
     ##########################################################
     ##########################################################
@@ -439,10 +630,18 @@ class Board:
         currentStatus.append(self._stringSizes.copy())
         currentStatus.append(self._empties.copy())
         currentStatus.append(self._currentHash)
+        currentStatus.append(self._symHashes)
+        currentStatus.append(self._suicideFreeBLACK)
+        currentStatus.append(self._suicideFreeWHITE)
+        currentStatus.append(self._enclosed)
         self._trailMoves.append(currentStatus)
 
     def _popBoard(self):
         oldStatus = self._trailMoves.pop()
+        self._enclosed = oldStatus.pop()
+        self._suicideFreeWHITE = oldStatus.pop()
+        self._suicideFreeBLACK = oldStatus.pop()
+        self._symHashes = oldStatus.pop()
         self._currentHash = oldStatus.pop()
         self._empties = oldStatus.pop()
         self._stringSizes = oldStatus.pop()
@@ -458,6 +657,49 @@ class Board:
         self._nbWHITE = oldStatus.pop()
         self._historyMoveNames.pop()
 
+    ''' Trail based undo. Instead of copying the four arrays and the set of the empty points, push() only keeps the
+    scalar values (the bitsets and _symHashes are never modified in place, so they are kept, not copied) and a list
+    of records (array, index, old value) of the entries modified by _put_stone (with the merges) and
+    _capture_string, where array is 0 for _board, 1 for _stringUnionFind, 2 for _stringLiberties and 3 for
+    _stringSizes, and 4 for the stone put on an empty point (old value is the liberties entry of the point, its
+    other entries are 0 and -1). pop() writes the old values back in reverse order, and puts the points back in
+    _empties or out of it.
+    Inside a frame, _getStringOfStone does not reroute the paths (it would have to be undone too), so _put_stone
+    merges the smaller string under the larger one. The records read and write the arrays through the memoryviews
+    of _cells, cheaper than numpy for one int.'''
+
+    def _set_cells(self):
+        if self._trailUndo:
+            self._cells = tuple(memoryview(a) for a in (self._board, self._stringUnionFind, self._stringLiberties,
+                                                        self._stringSizes))
+        else:
+            self._cells = None
+
+    def _pushTrail(self):
+        self._undo = []
+        self._trailMoves.append((self._nbWHITE, self._nbBLACK, self._capturedWHITE, self._capturedBLACK,
+            self._nextPlayer, self._gameOver, self._lastPlayerHasPassed, self._currentHash, self._symHashes,
+            self._suicideFreeBLACK, self._suicideFreeWHITE, self._enclosed, self._undo))
+
+    def _popTrail(self):
+        (self._nbWHITE, self._nbBLACK, self._capturedWHITE, self._capturedBLACK, self._nextPlayer, self._gameOver,
+            self._lastPlayerHasPassed, self._currentHash, self._symHashes, self._suicideFreeBLACK,
+            self._suicideFreeWHITE, self._enclosed, undo) = self._trailMoves.pop()
+        arrays = self._cells
+        empties = self._empties
+        for array, index, old in reversed(undo):
+            if array < 4:
+                arrays[array][index] = old
+                if array == 0: # a captured stone
+                    empties.discard(index)
+            else: # the stone put on an empty point
+                arrays[0][index] = Board._EMPTY
+                arrays[1][index] = arrays[3][index] = -1
+                arrays[2][index] = old
+                empties.add(index)
+        self._undo = self._trailMoves[-1][-1] if self._trailMoves else None
+        self._historyMoveNames.pop()
+
     def _getPositionHash(self, fcoord, color):
         return self._positionHashes[fcoord][color-1]
 
@@ -477,12 +719,13 @@ class Board:
         while self._stringUnionFind[fcoord] != -1:
             fcoord = self._stringUnionFind[fcoord]
             successives.append(fcoord)
-        if len(successives) > 1:
+        if len(successives) > 1 and self._undo is None: # not in a trail frame (it would have to be undone too)
             for fc in successives[:-1]:
                 self._stringUnionFind[fc] = fcoord
         return fcoord
 
     def _merge_strings(self, str1, str2):
+        # Only called by _put_stone, that records the modified entries in trail undo mode
         self._stringLiberties[str1] += self._stringLiberties[str2]
         self._stringLiberties[str2] = -1
         self._stringSizes[str1] += self._stringSizes[str2]
@@ -491,8 +734,13 @@ class Board:
         self._stringUnionFind[str2] = str1
 
     def _put_stone(self, fcoord, color):
+        undo = self._undo
+        if undo is not None:
+            cells = self._cells
+            undo.append((4, fcoord, cells[2][fcoord]))
         self._board[fcoord] = color
         self._currentHash ^= self._getPositionHash(fcoord, color)
+        self._symHashes = self._symHashes ^ self._symPositionHashes[fcoord, color-1]
         if self._DEBUG:
             assert fcoord in self._empties
         self._empties.remove(fcoord)
@@ -518,12 +766,25 @@ class Board:
             fn = self._neighbors[i]
             if self._board[fn] == color: # We may have to merge the strings
                 stringNumber = self._getStringOfStone(fn)
+                if undo is not None:
+                    undo.append((2, stringNumber, cells[2][stringNumber]))
                 self._stringLiberties[stringNumber] -= 1
                 if currentString != stringNumber:
-                    self._merge_strings(stringNumber, currentString)
-                currentString = stringNumber
+                    # The smaller string goes under the larger one, so that the paths to the roots stay short
+                    if self._stringSizes[currentString] > self._stringSizes[stringNumber]:
+                        root, merged = currentString, stringNumber
+                    else:
+                        root, merged = stringNumber, currentString
+                    if undo is not None: # the other entries are already recorded (fcoord's by its first record)
+                        undo.append((3, stringNumber, cells[3][stringNumber]))
+                        if merged != fcoord:
+                            undo.append((1, merged, -1))
+                    self._merge_strings(root, merged)
+                    currentString = root
             elif self._board[fn] != Board._EMPTY: # Other color
                 stringNumber = self._getStringOfStone(fn)
+                if undo is not None:
+                    undo.append((2, stringNumber, cells[2][stringNumber]))
                 self._stringLiberties[stringNumber] -= 1
                 if self._stringLiberties[stringNumber] == 0:
                     if stringNumber not in stringWithNoLiberties: # We may capture more than one string
@@ -591,6 +852,116 @@ class Board:
 
         return False
 
+    def _suicide_free_moves(self):
+        ''' Returns the list of the empty points that are not suicides for the next player, read from the bitset.'''
+        bits = self._suicideFreeBLACK if self._nextPlayer == Board._BLACK else self._suicideFreeWHITE
+        if Board._DEBUG:
+            assert bits == sum(1 << int(m) for m in self._empties if not self._is_suicide(m, self._nextPlayer))
+        moves = []
+        while bits:
+            low = bits & -bits
+            moves.append(low.bit_length() - 1)
+            bits ^= low
+        return moves
+
+    def _update_suicide_free(self, fcoord, capturedStones):
+        ''' Updates the suicide-free bitsets after a stone was put on fcoord and capturedStones were removed.
+        A point with an empty neighbor is never a suicide, so only the enclosed empty points (all neighbors
+        occupied, kept in the _enclosed bitset) may be suicides. Such a point has to be checked again only if it
+        is newly enclosed (around fcoord) or if one of its strings has a new number of liberties that is (or was)
+        small enough (at most 4) to be only given by this point.'''
+        board = self._board
+        neighbors = self._neighbors
+        entries = self._neighborsEntries
+        bit = 1 << int(fcoord)
+        freeBLACK = self._suicideFreeBLACK & ~bit
+        freeWHITE = self._suicideFreeWHITE & ~bit
+        enclosed = self._enclosed & ~bit
+        toCheck = 0
+
+        strings = set()
+        st = self._getStringOfStone(fcoord)
+        if self._stringLiberties[st] <= 4:
+            strings.add(st)
+        i = entries[fcoord]
+        while neighbors[i] != -1:
+            fn = neighbors[i]
+            i += 1
+            c = board[fn]
+            if c == Board._EMPTY:
+                if self._is_enclosed(fn):
+                    bit = 1 << int(fn)
+                    enclosed |= bit
+                    toCheck |= bit
+            elif c == Board._BLACK or c == Board._WHITE:
+                st = self._getStringOfStone(fn)
+                if self._stringLiberties[st] <= 4:
+                    strings.add(st)
+
+        gained = {} # Strings around the captured stones have gained one liberty per adjacent captured stone
+        for s in capturedStones: # all the captured stones are already removed from the board
+            bit = 1 << int(s)
+            if self._is_enclosed(s):
+                enclosed |= bit
+                toCheck |= bit
+            else:
+                freeBLACK |= bit
+                freeWHITE |= bit
+            i = entries[s]
+            while neighbors[i] != -1:
+                fn = neighbors[i]
+                i += 1
+                c = board[fn]
+                if c == Board._EMPTY:
+                    bit = 1 << int(fn)
+                    enclosed &= ~bit
+                    toCheck &= ~bit
+                    freeBLACK |= bit
+                    freeWHITE |= bit
+                elif c == Board._BLACK or c == Board._WHITE:
+                    st = self._getStringOfStone(fn)
+                    gained[st] = gained.get(st, 0) + 1
+        for st in gained:
+            if self._stringLiberties[st] - gained[st] <= 4:
+                strings.add(st)
+
+        if strings:
+            bits = enclosed & ~toCheck
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                i = entries[bit.bit_length() - 1]
+                while neighbors[i] != -1:
+                    if self._getStringOfStone(neighbors[i]) in strings:
+                        toCheck |= bit
+                        break
+                    i += 1
+
+        while toCheck:
+            bit = toCheck & -toCheck
+            toCheck ^= bit
+            m = bit.bit_length() - 1
+            if self._is_suicide(m, Board._BLACK):
+                freeBLACK &= ~bit
+            else:
+                freeBLACK |= bit
+            if self._is_suicide(m, Board._WHITE):
+                freeWHITE &= ~bit
+            else:
+                freeWHITE |= bit
+
+        self._suicideFreeBLACK = freeBLACK
+        self._suicideFreeWHITE = freeWHITE
+        self._enclosed = enclosed
+
+    def _is_enclosed(self, fcoord):
+        i = self._neighborsEntries[fcoord]
+        while self._neighbors[i] != -1:
+            if self._board[self._neighbors[i]] == Board._EMPTY:
+                return False
+            i += 1
+        return True
+
     # Checks if the move leads to an already seen board
     # By doing this, it has to "simulate" the move, and thus
     # it computes also the sets of strings to be removed by the move.
@@ -643,46 +1014,103 @@ class Board:
         return string
 
     def _count_areas(self):
-        ''' Costly function that computes the number of empty positions that only reach respectively BLACK  and WHITE
-        stones (the third values is the number of places touching both colours)'''
-        to_check = self._empties.copy() # We need to check all the empty positions
+        ''' Computes the number of empty positions that only reach respectively BLACK and WHITE stones (the third
+        values is the number of places touching both colours). Each empty area is flood filled once, on a python
+        list copy of the board and with the precomputed neighbors lists (no numpy scalar access).'''
+        cells = self._board.tolist()
+        neighbors = Board._neighbors_lists()
+        seen = [False] * len(cells)
         only_blacks = 0
         only_whites = 0
         others = 0
-        while len(to_check) > 0:
-            s = to_check.pop()
-            ssize = 0
-            assert self._board[s] == Board._EMPTY
+        for s in range(len(cells)):
+            if cells[s] != Board._EMPTY or seen[s]:
+                continue
+            seen[s] = True
             frontier = [s]
-            touched_blacks, touched_whites = 0, 0
-            currentstring = []
+            ssize = 0
+            touched_blacks, touched_whites = False, False
             while frontier:
                 current = frontier.pop()
-                currentstring.append(current)
-                ssize += 1 # number of empty places in this loop
-                assert current not in to_check
-                i = self._neighborsEntries[current]
-                while self._neighbors[i] != -1:
-                    n = self._neighbors[i]
-                    i += 1
-                    if self._board[n] == Board._EMPTY and n in to_check:
-                        to_check.remove(n)
-                        frontier.append(n)
-                    elif self._board[n] == Board._BLACK:
-                        touched_blacks += 1
-                    elif self._board[n] == Board._WHITE:
-                        touched_whites += 1
-            # here we have gathered all the informations about an empty area
-            assert len(currentstring) == ssize
-            assert (self._nbBLACK == 0 and self._nbWHITE == 0) or touched_blacks > 0 or touched_whites > 0
-            if touched_blacks == 0 and touched_whites > 0:
+                ssize += 1 # number of empty places in this area
+                for n in neighbors[current]:
+                    c = cells[n]
+                    if c == Board._EMPTY:
+                        if not seen[n]:
+                            seen[n] = True
+                            frontier.append(n)
+                    elif c == Board._BLACK:
+                        touched_blacks = True
+                    elif c == Board._WHITE:
+                        touched_whites = True
+            if touched_whites and not touched_blacks:
                 only_whites += ssize
-            elif touched_whites == 0 and touched_blacks > 0:
+            elif touched_blacks and not touched_whites:
                 only_blacks += ssize
             else:
                 others += ssize
         return (only_blacks, only_whites, others)
 
+    _neighborsTables = {} # (lists, numpy table) of neighbors, by board size
+
+    @staticmethod
+    def _neighbors_tables():
+        ''' Precomputed neighbors of each flat coordinate, as python lists and as a (size*size, 4) numpy table
+        padded with the index size*size (used as an always empty sentinel by count_areas_batch).'''
+        n = Board._BOARDSIZE**2
+        if n not in Board._neighborsTables:
+            lists = []
+            for fcoord in range(n):
+                x, y = Board.unflatten(fcoord)
+                lists.append([Board.flatten(c) for c in ((x+1, y), (x-1, y), (x, y+1), (x, y-1))
+                    if 0 <= c[0] < Board._BOARDSIZE and 0 <= c[1] < Board._BOARDSIZE])
+            table = np.full((n, 4), n, dtype=np.intp)
+            for fcoord, l in enumerate(lists):
+                table[fcoord, :len(l)] = l
+            Board._neighborsTables[n] = (lists, table)
+        return Board._neighborsTables[n]
+
+    @staticmethod
+    def _neighbors_lists():
+        return Board._neighbors_tables()[0]
+
+    @staticmethod
+    def count_areas_batch(boards):
+        ''' Same as _count_areas for N boards at once, given as a (N, size*size) array of cells (as returned by
+        get_board()). Returns a (N, 3) array of (only_blacks, only_whites, others).
+
+        All the empty areas are labelled together: each empty cell starts with its own index as label and takes
+        the minimum label of its empty neighbors (plus a pointer jumping step) until nothing changes.'''
+        boards = np.asarray(boards)
+        N, n = boards.shape
+        table = Board._neighbors_tables()[1]
+        empty = boards == Board._EMPTY
+        sentinel = np.full((N, 1), n, dtype=np.intp)
+        labels = np.where(empty, np.arange(n), n)
+        while True:
+            padded = np.concatenate([labels, sentinel], axis=1)
+            new = np.minimum(labels, padded[:, table].min(axis=2))
+            new[~empty] = n
+            padded = np.concatenate([new, sentinel], axis=1)
+            new = np.take_along_axis(padded, new, axis=1)
+            if np.array_equal(new, labels):
+                break
+            labels = new
+
+        # Colors around each empty cell, then gathered by area
+        cells = np.concatenate([boards, np.zeros((N, 1), dtype=boards.dtype)], axis=1)[:, table]
+        touched_blacks = (cells == Board._BLACK).any(axis=2) & empty
+        touched_whites = (cells == Board._WHITE).any(axis=2) & empty
+        flat = (labels + (np.arange(N) * (n + 1))[:, None]).ravel()
+        length = N * (n + 1)
+        sizes = np.bincount(flat, weights=empty.ravel(), minlength=length)
+        area_blacks = np.bincount(flat, weights=touched_blacks.ravel(), minlength=length) > 0
+        area_whites = np.bincount(flat, weights=touched_whites.ravel(), minlength=length) > 0
+        only_blacks = (sizes * (area_blacks & ~area_whites)).reshape(N, n + 1).sum(axis=1)
+        only_whites = (sizes * (area_whites & ~area_blacks)).reshape(N, n + 1).sum(axis=1)
+        others = empty.sum(axis=1) - only_blacks - only_whites
+        return np.stack([only_blacks, only_whites, others], axis=1).astype(int)
+
     def _piece2str(self, c):
         if c==Board._WHITE:
             return 'O'
@@ -764,7 +1192,11 @@ class Board:
         # to recover all the stones, given a string number, we must 
         # search for them.
         string = self._breadthSearchString(fc)
+        undo = self._undo
+        cells = self._cells
         for s in string:
+            if undo is not None:
+                undo.extend(((0, s, cells[0][s]), (1, s, cells[1][s]), (2, s, cells[2][s]), (3, s, cells[3][s])))
             if self._nextPlayer == Board._WHITE:
                 self._capturedBLACK += 1
                 self._nbBLACK -= 1
@@ -772,6 +1204,7 @@ class Board:
                 self._capturedWHITE += 1
                 self._nbWHITE -= 1
             self._currentHash ^= self._getPositionHash(s, self._board[s])
+            self._symHashes = self._symHashes ^ self._symPositionHashes[s, self._board[s]-1]
             self._board[s] = self._EMPTY
             self._empties.add(s)
             i = self._neighborsEntries[s]
@@ -780,11 +1213,14 @@ class Board:
                 if self._board[fn] != Board._EMPTY:
                     st = self._getStringOfStone(fn)
                     if st != s:
+                        if undo is not None:
+                            undo.append((2, st, cells[2][st]))
                         self._stringLiberties[st] += 1
                 i += 1
             self._stringUnionFind[s] = -1
             self._stringSizes[s] = -1
             self._stringLiberties[s] = -1
+        return string
 
 
     ''' Internal wrapper to full_play_move. Simply translate named move into
@@ -867,4 +1303,72 @@ class Board:
         #'\    <text x="100" y="100" font-size="30" font-color="black"> Hello </text>\
         return board
 
+    ##########################################################
+    ##########################################################
+    ''' Optional profiling of the main methods. When enabled, the methods of _PROFILED are replaced (in the class,
+    thus for all the boards) by wrappers counting their calls and time (including the time of the profiled methods
+    they call). When disabled, the original methods are put back, so there is no cost at all.'''
+
+    _PROFILED = ("push", "pop", "legal_moves", "weak_legal_moves", "_is_suicide", "_is_super_ko", "_capture_string",
+                 "_count_areas")
+    _profile = None # {method name: [calls, seconds]} while the profiling is enabled
+    _unprofiled = {}
+
+    @staticmethod
+    def enable_profiling():
+        if Board._profile is not None:
+            return
+        Board._profile = {}
+        for name in Board._PROFILED:
+            method = Board.__dict__[name]
+            Board._unprofiled[name] = method
+            stats = Board._profile[name] = [0, 0.]
+
+            @functools.wraps(method)
+            def wrapper(*args, method=method, stats=stats, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    stats[0] += 1
+                    stats[1] += time.perf_counter() - start
+            setattr(Board, name, wrapper)
+
+    @staticmethod
+    def profiling_enabled():
+        return Board._profile is not None
+
+    @staticmethod
+    def disable_profiling():
+        for name, method in Board._unprofiled.items():
+            setattr(Board, name, method)
+        Board._unprofiled = {}
+        Board._profile = None
+
+    @staticmethod
+    def profile_snapshot():
+        ''' Copy of the current counters, {method name: (calls, seconds)} (empty if the profiling is disabled).'''
+        if Board._profile is None:
+            return {}
+        return {name: tuple(stats) for name, stats in Board._profile.items()}
+
+    @staticmethod
+    def profile_accumulate(total, before, after):
+        ''' Adds to total the calls and time spent between two snapshots (e.g. during one getPlayerMove).'''
+        for name, (calls, seconds) in after.items():
+            calls0, seconds0 = before.get(name, (0, 0.))
+            c, s = total.get(name, (0, 0.))
+            total[name] = (c + calls - calls0, s + seconds - seconds0)
+        return total
+
+    @staticmethod
+    def profile_report(stats, as_json=False):
+        ''' Summary table (or JSON) of counters, the most costly methods first.'''
+        if as_json:
+            return json.dumps({name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in stats.items()})
+        lines = [f"{'method':<18}{'calls':>10}{'seconds':>10}{'us/call':>10}"]
+        for name, (calls, seconds) in sorted(stats.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<18}{calls:>10}{seconds:>10.3f}{1e6 * seconds / calls if calls else 0:>10.1f}")
+        return "\n".join(lines)
+
 
@@ -0,0 +1,323 @@
+''' Benchmark suite for the Goban.Board engine and the players.
+
+Every workload runs on 8x8 and 9x9 from fixed seeds:
+    - random playouts (push_lazy), and the same playouts 1024 at a time with BatchGoban.BatchBoards
+    - push/pop pairs with the snapshot and trail undo, and their cost over push_lazy
+    - legal_moves and weak_legal_moves calls
+    - compute_score calls
+    - a perft node count (see perft.py)
+With --players, each player's search is measured too (nodes or playouts per second). The results can be written as
+JSON and compared with the file of an earlier run to spot regressions.
+
+    python3 bench.py                        --> all the engine workloads
+    python3 bench.py -o bench.json          --> same, also written as JSON
+    python3 bench.py --compare bench.json   --> same, with the ratios to an earlier run
+    python3 bench.py --players -t 2         --> also the players, 2 seconds of search each
+    python3 bench.py --deepml               --> also the leaves evaluated per second by deepml's network (the old
+                                                per-leaf loop, one by one and batched)
+'''
+import argparse
+import io
+import json
+import platform
+import random
+import subprocess
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+import numpy as np
+
+import BatchGoban
+import Goban
+from perft import perft
+
+SIZES = (8, 9)
+
+
+def best_time(fn, repeat):
+    ''' Best wall-clock time of repeat calls of fn (less sensitive to the machine load than the mean).'''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def random_playout(size, seed, max_moves=400):
+    ''' Plays a random game (with weak_legal_moves and push_lazy) and returns the list of accepted moves.'''
+    Goban.Board._BOARDSIZE = size
+    rng = random.Random(seed)
+    b = Goban.Board()
+    moves = []
+    while not b.is_game_over() and len(moves) < max_moves:
+        m = rng.choice(b.weak_legal_moves())
+        if b.push_lazy(m):
+            moves.append(m)
+    return moves
+
+
+def bench_playouts(size, seed, games, repeat=5):
+    ''' Returns the number of random playouts and of moves played per second.'''
+    moves = 0
+    def run():
+        nonlocal moves
+        moves = sum(len(random_playout(size, seed + g)) for g in range(games))
+    elapsed = best_time(run, repeat)
+    return games / elapsed, moves / elapsed
+
+
+def bench_batch_playouts(size, seed, games=1024, repeat=3):
+    ''' Returns the number of random playouts per second of BatchGoban.BatchBoards playing games games at once.'''
+    Goban.Board._BOARDSIZE = size
+    rng = np.random.default_rng(seed)
+    elapsed = best_time(lambda: BatchGoban.BatchBoards(games).playout(rng), repeat)
+    return games / elapsed
+
+
+def bench_push_pop(size, playouts, repeat=5):
+    ''' Replays each playout with push() then undoes it with pop(), with snapshots and with the trail undo, and
+    with push_lazy() only (the cost of the moves themselves). The three are interleaved and the best of the repeated
+    runs of each playout is kept (short runs, so that the load of the machine is the same for all). Returns the
+    number of moves per second for (push_lazy, snapshot push/pop, trail push/pop).'''
+    Goban.Board._BOARDSIZE = size
+    moves = sum(len(m) for m in playouts)
+    old_mode = Goban.Board._TRAIL_UNDO
+    total = [0., 0., 0.]
+    try:
+        for ms in playouts:
+            best = [None, None, None]
+            for _ in range(repeat):
+                for mode in range(3):
+                    Goban.Board._TRAIL_UNDO = mode == 2
+                    b = Goban.Board()
+                    start = time.perf_counter()
+                    if mode == 0:
+                        for m in ms:
+                            b.push_lazy(m)
+                    else:
+                        for m in ms:
+                            b.push(m)
+                        for _ in ms:
+                            b.pop()
+                    elapsed = time.perf_counter() - start
+                    if best[mode] is None or elapsed < best[mode]:
+                        best[mode] = elapsed
+            total = [t + e for t, e in zip(total, best)]
+    finally:
+        Goban.Board._TRAIL_UNDO = old_mode
+    return tuple(moves / t for t in total)
+
+
+def sample_boards(playouts, every=5):
+    ''' Copies of one position every few moves of the playouts.'''
+    boards = []
+    for moves in playouts:
+        b = Goban.Board()
+        for i, m in enumerate(moves):
+            b.push_lazy(m)
+            if i % every == 0:
+                boards.append(Goban.Board(b))
+    return boards
+
+
+def bench_calls(boards, method, repeat=5):
+    ''' Calls per second of a method (without arguments) on the boards.'''
+    def run():
+        for b in boards:
+            method(b)
+    return len(boards) / best_time(run, repeat)
+
+
+def bench_perft(size, depth):
+    ''' Returns the perft count from the empty board and the leaves per second.'''
+    Goban.Board._BOARDSIZE = size
+    b = Goban.Board()
+    start = time.perf_counter()
+    nodes = perft(b, depth)
+    return nodes, nodes / (time.perf_counter() - start)
+
+
+def search_position(size, seed, moves=10):
+    ''' A fixed early position for the players: some random moves (no pass) from the empty board.'''
+    Goban.Board._BOARDSIZE = size
+    rng = random.Random(seed)
+    b = Goban.Board()
+    for _ in range(moves):
+        b.push(rng.choice([m for m in b.legal_moves() if m != -1]))
+    return b
+
+
+def bench_players(size, seed, budget):
+    ''' Nodes searched per second by the alpha-beta players (playouts per second for mcts) with budget seconds from
+    a fixed position. What the players print is dropped.'''
+    import iterdeep
+    import mcts
+    modules = [("iterdeep", iterdeep)]
+    if size == 8: # the network of deepml is trained on 8x8
+        try:
+            import deepml
+            modules.append(("deepml", deepml))
+        except ImportError:
+            pass
+    board = search_position(size, seed)
+    selector = max if board.next_player() == Goban.Board._BLACK else min
+    results = {}
+    with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+        for name, module in modules:
+            player = module.myPlayer()
+            player.newGame(board.next_player())
+            player._book = None # the position could be in the book
+            start = time.perf_counter()
+            player.iter_deep(Goban.Board(board), budget, selector)
+            results[f"{name}_nodes_per_s"] = player._searchNodes / (time.perf_counter() - start)
+        random.seed(seed)
+        player = mcts.myPlayer()
+        root = mcts.Node(None, Goban.Board.flip(board.next_player()))
+        playouts, elapsed = player.run(Goban.Board(board), root, budget)
+        results["mcts_playouts_per_s"] = playouts / elapsed
+    return results
+
+
+def reference_heuristique(player, board):
+    ''' deepml's evaluation of a leaf before the batching: planes filled by a double loop, one forward pass.'''
+    import torch
+    blacks = np.zeros((8, 8))
+    whites = np.zeros((8, 8))
+    for x in range(8):
+        for y in range(8):
+            val = board[Goban.Board.flatten((x, y))]
+            if val == Goban.Board._BLACK:
+                blacks[x, y] = 1
+            elif val == Goban.Board._WHITE:
+                whites[x, y] = 1
+    with torch.no_grad():
+        return float(player.model(torch.Tensor(np.array([[blacks, whites]])))[0])
+
+
+def bench_leaf_eval(boards, batch=32, repeat=5):
+    ''' Evaluates the children of the 8x8 boards with deepml's network (without the evaluation cache):
+        - reference: one forward pass per leaf, planes filled by the old double loop (reference_heuristique),
+        - single: one forward pass per leaf, vectorised planes (player.evaluate with one board),
+        - batched: batches of batch leaves (player.evaluate),
+        - children: one batch per node (player.evaluate_children, as in the search).
+    The values of evaluate and evaluate_children are checked against the reference. Returns the number of leaves per
+    second for (reference, single, batched, children).'''
+    import deepml # needs torch and trained_model.pth
+    from deadline import Deadline
+    player = deepml.myPlayer()
+    player._deadline = Deadline(float("inf"))
+    nodes = [(b, b.legal_moves()) for b in boards if not b.is_game_over()]
+    cells = []
+    reference = []
+    for b, moves in nodes:
+        for m in moves:
+            b.push(m)
+            cells.append(b.get_board().copy())
+            reference.append(reference_heuristique(player, b))
+            b.pop()
+    cells = np.stack(cells)
+    single = [player.evaluate(cells[i:i + 1])[0] for i in range(len(cells))]
+    assert np.allclose(single, reference, rtol=0, atol=1e-6), "evaluate differs from the reference loop"
+    values = []
+    for b, moves in nodes:
+        player._cache.clear()
+        values.extend(player.evaluate_children(b, moves))
+    # the float32 kernels of a batch do not round as the ones of a single board (about 1e-6 apart)
+    assert np.allclose(values, reference, rtol=0, atol=1e-5), "evaluate_children differs from the reference loop"
+
+    def children():
+        for b, moves in nodes:
+            player._cache.clear()
+            player.evaluate_children(b, moves)
+
+    def leaves(fn):
+        for b, moves in nodes:
+            for m in moves:
+                b.push(m)
+                fn(b)
+                b.pop()
+
+    times = (best_time(lambda: leaves(lambda b: reference_heuristique(player, b)), repeat),
+             best_time(lambda: [player.evaluate(cells[i:i + 1]) for i in range(len(cells))], repeat),
+             best_time(lambda: [player.evaluate(cells[i:i + batch]) for i in range(0, len(cells), batch)], repeat),
+             best_time(children, repeat))
+    return tuple(len(cells) / t for t in times)
+
+
+def run_suite(args):
+    ''' Returns {"8x8": {workload: value}, "9x9": {...}}.'''
+    results = {}
+    for size in SIZES:
+        r = results[f"{size}x{size}"] = {}
+        r["playouts_per_s"], r["playout_moves_per_s"] = bench_playouts(size, args.seed, args.games, args.repeat)
+        r["batch_playouts_per_s"] = bench_batch_playouts(size, args.seed)
+        playouts = [random_playout(size, args.seed + g) for g in range(args.games)]
+        lazy, snapshot, trail = bench_push_pop(size, playouts, args.repeat)
+        r["push_lazy_per_s"], r["push_pop_snapshot_per_s"], r["push_pop_trail_per_s"] = lazy, snapshot, trail
+        # cost of the undo alone, per move: push/pop minus push_lazy
+        r["undo_snapshot_ns"], r["undo_trail_ns"] = 1e9 / snapshot - 1e9 / lazy, 1e9 / trail - 1e9 / lazy
+        boards = sample_boards(playouts)
+        r["legal_moves_per_s"] = bench_calls(boards, Goban.Board.legal_moves, args.repeat)
+        r["weak_legal_moves_per_s"] = bench_calls(boards, Goban.Board.weak_legal_moves, args.repeat)
+        r["compute_score_per_s"] = bench_calls(boards, Goban.Board.compute_score, args.repeat)
+        r[f"perft_{args.depth}_nodes"], r[f"perft_{args.depth}_nodes_per_s"] = bench_perft(size, args.depth)
+        if args.players:
+            r.update(bench_players(size, args.seed, args.time))
+        if args.deepml and size == 8:
+            nodes = boards[::max(1, len(boards) // 50)] # about 50 nodes, the reference loop is slow
+            reference, single, batched, children = bench_leaf_eval(nodes, args.batch, args.repeat)
+            r["deepml_reference_leaves_per_s"], r["deepml_leaves_per_s"] = reference, single
+            r[f"deepml_batch_{args.batch}_leaves_per_s"], r["deepml_children_leaves_per_s"] = batched, children
+    return results
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=__file__.rpartition("/")[0] or ".").stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "machine": platform.machine(), "args": vars(args)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Goban.Board and players benchmarks")
+    parser.add_argument("-g", "--games", type=int, default=20, help="number of random playouts per board size")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of replays (the best one is kept)")
+    parser.add_argument("-s", "--seed", type=int, default=42)
+    parser.add_argument("-d", "--depth", type=int, default=2, help="depth of the perft count")
+    parser.add_argument("--players", action="store_true", help="also bench the search of the players")
+    parser.add_argument("-t", "--time", type=float, default=2., help="search time of each player, in seconds")
+    parser.add_argument("--deepml", action="store_true", help="also bench deepml's network on the 8x8 positions")
+    parser.add_argument("-b", "--batch", type=int, default=32, help="batch size of the network evaluations")
+    parser.add_argument("-o", "--output", default=None, help="JSON file where the results are written")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare with")
+    args = parser.parse_args()
+
+    old_size = Goban.Board._BOARDSIZE
+    try:
+        results = run_suite(args)
+    finally:
+        Goban.Board._BOARDSIZE = old_size
+
+    previous = {}
+    if args.compare is not None:
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+    for size, workloads in results.items():
+        for name, value in workloads.items():
+            line = f"{size} {name:<30} {value:>12.0f}"
+            old = previous.get(size, {}).get(name)
+            if old:
+                line += f"  x{value / old:.2f} (was {old:.0f})"
+            print(line)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"meta": metadata(args), "results": results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
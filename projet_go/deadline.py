@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+''' Cooperative time control for the search players.
+
+Instead of a SIGALRM (whole seconds, main thread only, and the interrupted depth is lost), the search calls
+Deadline.check() at every node. The clock is only read every check_every calls and OutOfTimeException is raised
+once the time is over, so the caller can catch it and keep what it already searched.
+'''
+import time
+
+
+class OutOfTimeException(Exception):
+    pass
+
+
+class Deadline:
+
+    def __init__(self, seconds, check_every=64):
+        ''' seconds may be a float (sub-second budgets are fine).'''
+        self.start = time.perf_counter()
+        self.end = self.start + seconds
+        self._checkEvery = check_every
+        self._count = 0
+
+    def check(self):
+        ''' To call at each node: raises OutOfTimeException if the time is over (only checked every check_every
+        calls).'''
+        self._count += 1
+        if self._count >= self._checkEvery:
+            self._count = 0
+            if time.perf_counter() >= self.end:
+                raise OutOfTimeException
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def remaining(self):
+        return self.end - time.perf_counter()
@@ -5,7 +5,6 @@ myPlayer class.
 Right now, this class contains the copy of the randomPlayer. But you have to change this!
 '''
 import operator
-import signal
 import sys
 import time
 from functools import lru_cache
@@ -13,6 +12,12 @@ from functools import lru_cache
 import numpy as np
 
 import Goban
+from CompactGoban import CompactBoard
+from deadline import Deadline, OutOfTimeException
+from evalcache import EvalCache
+from openingbook import OpeningBook
+import parallel
+from transposition import TranspositionTable
 from random import choice
 from playerInterface import *
 
@@ -20,15 +25,6 @@ import torch
 from torch import nn
 
 
-class OutOfTimeException(Exception):
-    pass
-
-
-def out_of_time_handler(signum, frame):
-    print("Time is over", file=sys.stderr)
-    raise OutOfTimeException
-
-
 class myPlayer(PlayerInterface):
     ''' Example of a random player for the go. The only tricky part is to be able to handle
     the internal representation of moves given by legal_moves() and used by push() and
@@ -36,9 +32,20 @@ class myPlayer(PlayerInterface):
 
     '''
 
-    def __init__(self):
+    def __init__(self, workers=1, cache_bytes=64 * 2**20, verbose=False):
         self._board = Goban.Board()
         self._mycolor = None
+        self._verbose = verbose  # Stats of the book and the tables after each move (also with --profile)
+        self._workers = workers  # More than 1: the root moves are searched by a process pool (see parallel.py)
+        self._pool = None
+        self._book = OpeningBook.load()  # None if there is no book.npy (see openingbook.py)
+        self._lastValue = "unknown"  # Value of the last iter_deep search
+        self._table = TranspositionTable()
+        self._cache = EvalCache(cache_bytes)  # Network values, kept between the moves of a game
+        self._deadline = None
+        self._searchNodes = 0  # Nodes (leaves included) of the last iter_deep search
+        self._firstMoveTime = 0  # Time taken by the first root move of the last depth
+        self._interrupted = False
         self.init_model()
 
     def getPlayerName(self):
@@ -50,8 +57,19 @@ class myPlayer(PlayerInterface):
             return "PASS"
 
         # 1 is black player (first to play), 2 is white player (2nd to play)
-        move = self.iter_deep(self._board, 2, max if self._mycolor == 1 else min)
+        book = None
+        if self._book is not None:
+            book = self._book.lookup(self._board)
+        if book is not None and book[0] in self._board.legal_moves():
+            move = book[0]
+            print(f"Book move {Goban.Board.flat_to_name(move)} (score {book[1]})", file=sys.stderr)
+        elif self._workers > 1:
+            move = self.iter_deep_parallel(self._board, 2, max if self._mycolor == 1 else min)
+        else:
+            move = self.iter_deep(self._board, 2, max if self._mycolor == 1 else min)
         self._board.push(move)
+        if self._verbose or Goban.Board.profiling_enabled(): # as the Goban.Board counters of --profile
+            self.print_stats()
 
         # New here: allows to consider internal representations of moves
         print("I am playing ", self._board.move_to_str(move))
@@ -60,6 +78,13 @@ class myPlayer(PlayerInterface):
         # move is an internal representation. To communicate with the interface I need to change if to a string
         return Goban.Board.flat_to_name(move)
 
+    def print_stats(self):
+        ''' Hits of the opening book, the transposition table and the evaluation cache so far, on stderr.'''
+        if self._book is not None:
+            self._book.print_stats()
+        self._table.print_stats()
+        self._cache.print_stats()
+
     def playOpponentMove(self, move):
         print("Opponent played ", move) # New here
         # the board needs an internal represetation to push the move.  Not a string
@@ -68,52 +93,95 @@ class myPlayer(PlayerInterface):
     def newGame(self, color):
         self._mycolor = color
         self._opponent = Goban.Board.flip(color)
+        self._table.clear()
+        self._cache.clear()
 
     def endGame(self, winner):
         if self._mycolor == winner:
             print("I won!!!")
         else:
             print("I lost :(!!")
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
 
     def iter_deep(self, board, available_time, selector=max):
-        signal.signal(signal.SIGALRM, out_of_time_handler)
-        signal.alarm(available_time)
+        ''' Iterative deepening within available_time seconds, with the same cooperative deadline as iterdeep.py.
+        The network is slow, so the clock is read at each node.'''
+        self._deadline = deadline = Deadline(available_time, check_every=1)
+        self._table.new_search()
+        self._searchNodes = 0
 
         best_estimation = choice(list(board.legal_moves()))
 
         depth = 1
-        time_took = 0
         reached_end = False
         board_value = "unknown"
-        try:
-            while available_time > time_took and not reached_end:
-                start = time.perf_counter()
-                best_estimation, reached_end, board_value = self.max_alpha(board, depth, selector=selector)
-                end = time.perf_counter()
-                time_took += end - start
-                depth += 1
-
-            signal.alarm(0)
-        except OutOfTimeException as ignored:
-            pass
+        depth_times = []
+        while not reached_end:
+            if len(depth_times) >= 2:  # The search time grows by about the same factor at each depth
+                estimate = self._firstMoveTime * depth_times[-1] / max(depth_times[-2], 1e-6)
+                if deadline.remaining() < estimate:
+                    break
+            start = deadline.elapsed()
+            best_estimation, reached_end, board_value = self.max_alpha(board, depth, selector=selector,
+                                                                       first=best_estimation)
+            if self._interrupted:
+                break
+            depth_times.append(deadline.elapsed() - start)
+            depth += 1
 
         print(
-            f"iter_deep took {time_took} seconds, reached depth {depth} ({reached_end=}), board estimated : {board_value}.", file=sys.stderr)
+            f"iter_deep took {deadline.elapsed()} seconds, reached depth {depth} ({reached_end=}), board estimated : {board_value}.", file=sys.stderr)
+        self._lastValue = board_value
         return best_estimation
 
-    def max_alpha(self, board, depth, selector=min):
+    def iter_deep_parallel(self, board, available_time, selector=max):
+        ''' Same as iter_deep, but the root moves of each depth are searched by the workers of the process pool
+        (see parallel.iter_deep).'''
+        if self._pool is None:
+            self._pool = parallel.SearchPool(__name__, self._workers)
+        return parallel.iter_deep(self._pool, board, available_time, selector)
+
+    def search_moves(self, state, moves, depth, selector, end_time):
+        ''' Worker side of iter_deep_parallel: searches the given root moves from the state (see
+        Goban.Board.get_state) before end_time, with parallel.alpha_beta_moves.'''
+        board = self._board
+        board.set_state(state)
+        self._deadline = Deadline(end_time - time.time(), check_every=1)
+        return parallel.alpha_beta_moves(board, moves, depth, selector, self.alpha_beta)
+
+    def max_alpha(self, board, depth, selector=min, first=None):
         def swap():
             return min if selector == max else max
 
-        board = Goban.Board(board)
+        board = CompactBoard(board)  # cheap copies and snapshots for the search
         reached_end = True  # Only used if there are no legal moves
         best_board = 0
         values = []
-        for move in board.legal_moves():
-            board.push(move)
-            value, reached_end, best_board = self.alpha_beta(board, depth - 1, selector=swap())
-            board.pop()
-            values.append((value, move))
+        moves = board.legal_moves()
+        if first in moves:  # The previous best move is searched first, an unfinished depth can then be used
+            moves.remove(first)
+            moves.insert(0, first)
+        self._interrupted = False
+        start = self._deadline.elapsed()
+        try:
+            leaves = self.evaluate_children(board, moves) if depth == 1 else None
+            for i, move in enumerate(moves):
+                if leaves is not None:
+                    value = best_board = leaves[i]
+                    reached_end = False
+                else:
+                    board.push(move)
+                    value, reached_end, best_board = self.alpha_beta(board, depth - 1, selector=swap())
+                    board.pop()
+                if not values:
+                    self._firstMoveTime = self._deadline.elapsed() - start
+                values.append((value, move))
+        except OutOfTimeException:
+            self._interrupted = True
+            if not values:
+                return first, False, "unknown"
 
         extremum = selector(values, key=operator.itemgetter(0))[0]
         return choice(list(filter(lambda v: v[0] == extremum, values)))[1], reached_end, best_board
@@ -122,32 +190,48 @@ class myPlayer(PlayerInterface):
         def swap():
             return min if selector == max else max
 
+        self._searchNodes += 1
+        self._deadline.check()
         if depth <= 0 or board.is_game_over():
             h = self.heuristique(board)
             return h, False, h  # Broken, for now assume we never end.
 
-        values = []
+        # Same position already searched (maybe through another move order)
+        key = TranspositionTable.key(board)
+        value, table_move = self._table.lookup(key, depth, alpha, beta)
+        if value is not None:
+            return value, False, value
+        window = (alpha, beta)
+
+        moves = board.legal_moves()
+        if table_move is not None and table_move in moves:  # Best move of the previous search goes first
+            moves.remove(table_move)
+            moves.insert(0, table_move)
+
         reached_end = True  # Only used if there are no legal moves
         best_board = 0
-        for move in board.legal_moves():
-            board.push(move)
-            value, reached_end, best_board = self.alpha_beta(board, depth - 1, alpha, beta, selector=swap())
-
-            board.pop()
+        extremum, best_move = None, None
+        leaves = self.evaluate_children(board, moves) if depth == 1 else None
+        for i, move in enumerate(moves):
+            if leaves is not None:
+                value = best_board = leaves[i]
+                reached_end = False
+            else:
+                board.push(move)
+                value, reached_end, best_board = self.alpha_beta(board, depth - 1, alpha, beta, selector=swap())
+                board.pop()
+
+            if best_move is None or (value > extremum if selector == max else value < extremum):
+                extremum, best_move = value, move
 
             if selector == min:  # min : enemy is choosing, we update upper_bound (beta)
                 beta = min(beta, value)
-                if alpha >= beta:
-                    return value, reached_end, best_board
             else:  # max : ally is choosing, we update lower_bound (alpha)
                 alpha = max(alpha, value)
-                if alpha >= beta:
-                    return value, reached_end, best_board
-
-            values.append(value)
-
-        extremum = selector(values)
+            if alpha >= beta:
+                break
 
+        self._table.store(key, depth, extremum, best_move, *window)
         return extremum, reached_end, best_board
 
     def init_model(self):
@@ -175,17 +259,45 @@ class myPlayer(PlayerInterface):
         self.model.eval()
 
 
-    # Very COSTLY
+    @staticmethod
+    def to_planes(cells):
+        ''' (B, 2, 8, 8) network input from a (B, 64) array of get_board() cells. The planes are indexed [x][y] as
+        in the training data, get_board() is in [y][x] order.'''
+        cells = cells.reshape(-1, 8, 8).transpose(0, 2, 1)
+        planes = np.stack([cells == Goban.Board._BLACK, cells == Goban.Board._WHITE], axis=1)
+        return torch.from_numpy(planes.astype(np.float32))
+
+    def evaluate(self, cells):
+        ''' Values of a (B, 64) array of boards, in one forward pass.'''
+        with torch.inference_mode():
+            return self.model(self.to_planes(cells))[:, 0].tolist()
+
+    def evaluate_children(self, board, moves):
+        ''' Values of the boards after each of the moves (the leaves under a depth 1 node). The ones that are not
+        in the evaluation cache are evaluated in one batch.'''
+        values = [None] * len(moves)
+        cells = np.empty((len(moves), Goban.Board._BOARDSIZE ** 2), dtype=np.int8)
+        missing = []
+        for i, move in enumerate(moves):
+            board.push(move)
+            key = EvalCache.key(board)
+            values[i] = self._cache.get(key)
+            if values[i] is None:
+                cells[len(missing)] = board.get_board()
+                missing.append((i, key))
+            board.pop()
+        self._searchNodes += len(moves)
+        self._deadline.check()
+        if missing:
+            for (i, key), value in zip(missing, self.evaluate(cells[:len(missing)])):
+                values[i] = value
+                self._cache.put(key, value)
+        return values
+
     def heuristique(self, board: Goban.Board):
-        blacks = np.zeros((8, 8))
-        whites = np.zeros((8, 8))
-        for x in range(8):
-            for y in range(8):
-                val = board[Goban.Board.flatten((x, y))]
-                if val == Goban.Board._BLACK:
-                    blacks[x, y] = 1
-                elif val == Goban.Board._WHITE:
-                    whites[x, y] = 1
-
-        X = torch.Tensor([[blacks, whites]])
-        return self.model(X)[0]
+        key = EvalCache.key(board)
+        value = self._cache.get(key)
+        if value is None:
+            value = self.evaluate(board.get_board()[None])[0]
+            self._cache.put(key, value)
+        return value
@@ -0,0 +1,158 @@
+''' Differential test of an alternative board engine against Goban.Board.
+
+    Both boards play the same random games (with push/pop, and some Board(other) copies) and, after each move, the
+    stones, the counters, the hashes, the legal moves and the scores must be the same.
+
+    python3 diffGoban.py                    --> 1000 random games on 5x5, 7x7, 8x8 and 9x9 against BitGoban.BitBoard
+    python3 diffGoban.py -n 200 -s 9
+    python3 diffGoban.py -e compact         --> same against CompactGoban.CompactBoard
+    python3 diffGoban.py -e batch           --> same against BatchGoban.BatchBoards (no push/pop: the games of each
+                                                size are played together, with push_lazy on the Goban.Boards)
+'''
+import argparse
+import random
+import sys
+
+import numpy as np
+
+import Goban
+import BatchGoban
+import BitGoban
+import CompactGoban
+
+ENGINES = {"bit": BitGoban.BitBoard, "compact": CompactGoban.CompactBoard, "batch": BatchGoban.BatchBoards}
+
+
+def compare(reference, other, full=True):
+    ''' Returns the list of the differences between the two boards (empty if they are the same).'''
+    errors = []
+    def check(name, a, b):
+        if a != b:
+            errors.append(f"{name}: {a} != {b}")
+    check("board", reference.get_board().tolist(), other.get_board().tolist())
+    check("next player", reference.next_player(), other.next_player())
+    check("game over", reference.is_game_over(), other.is_game_over())
+    check("hash", int(reference._currentHash), int(other._currentHash))
+    check("stones", (reference._nbBLACK, reference._nbWHITE), (other._nbBLACK, other._nbWHITE))
+    check("captured", (reference._capturedBLACK, reference._capturedWHITE),
+          (other._capturedBLACK, other._capturedWHITE))
+    check("weak legal moves", sorted(reference.weak_legal_moves()), sorted(other.weak_legal_moves()))
+    if full:
+        check("legal moves", sorted(reference.legal_moves()), sorted(other.legal_moves()))
+        check("areas", reference._count_areas(), other._count_areas())
+        check("score", reference.compute_score(), other.compute_score())
+        check("result", reference.result(), other.result())
+    return errors
+
+
+def random_game(engine, rng, full_every=1, max_moves=1000):
+    ''' Plays a random game on a Goban.Board and on a board of the given engine. Moves are taken from
+    weak_legal_moves (thus superKo are also checked through push), and some of them are popped back. Returns
+    the number of compared positions, or raises an AssertionError on the first difference.'''
+    reference = Goban.Board()
+    other = engine()
+    depth = 0
+    checked = 0
+    for step in range(max_moves):
+        if reference.is_game_over() or (depth > 0 and rng.random() < 0.2):
+            if depth == 0:
+                break
+            reference.pop()
+            other.pop()
+            depth -= 1
+        else:
+            if rng.random() < 0.02: # copies do not keep the push/pop stack
+                reference = Goban.Board(reference)
+                other = engine(other)
+                depth = 0
+            m = rng.choice(reference.weak_legal_moves())
+            ok = reference.push(m)
+            assert ok == other.push(m), f"push({Goban.Board.flat_to_name(m)}) returned {ok} for Goban.Board"
+            depth += 1
+        errors = compare(reference, other, full=(step % full_every == 0))
+        assert not errors, "\n".join(errors) + "\n" + str(reference)
+        checked += 1
+    return checked
+
+
+def compare_batch(reference, batch, k, full=True):
+    ''' Returns the list of the differences between the Goban.Board and the game k of the BatchBoards.'''
+    errors = []
+    def check(name, a, b):
+        if a != b:
+            errors.append(f"{name}: {a} != {b}")
+    check("board", reference.get_board().tolist(), batch.board[k].tolist())
+    check("next player", reference.next_player(), int(batch.nextPlayer[k]))
+    check("game over", reference.is_game_over(), bool(batch.gameOver[k]))
+    check("hash", int(reference._currentHash), int(batch.hashes[k]))
+    check("captured", (reference._capturedBLACK, reference._capturedWHITE),
+          (int(batch.capturedBLACK[k]), int(batch.capturedWHITE[k])))
+    if not reference.is_game_over():
+        check("weak legal moves", sorted(reference.weak_legal_moves()),
+              [-1] + np.flatnonzero(batch.legal_mask()[k]).tolist())
+    if full:
+        check("score", reference.compute_score(), tuple(batch.compute_score()[k].tolist()))
+    return errors
+
+
+def random_batch(games, rng, full_every=1, max_moves=1000):
+    ''' Plays games random games at once on Goban.Boards (with push_lazy) and on a BatchBoards, with the moves of
+    the Goban.Boards' weak_legal_moves. Returns the number of compared positions, or raises an AssertionError on
+    the first difference.'''
+    references = [Goban.Board() for _ in range(games)]
+    batch = BatchGoban.BatchBoards(games, max_moves)
+    played = [0] * games
+    checked = 0
+    step = 0
+    while any(not r.is_game_over() and p < max_moves for r, p in zip(references, played)):
+        moves = [rng.choice(r.weak_legal_moves()) if not r.is_game_over() and p < max_moves else -1
+                 for r, p in zip(references, played)]
+        ok = batch.play(moves)
+        for k, (reference, m) in enumerate(zip(references, moves)):
+            if reference.is_game_over() or played[k] >= max_moves:
+                continue
+            accepted = reference.push_lazy(m)
+            assert accepted == ok[k], f"game {k}: push_lazy({Goban.Board.flat_to_name(m)}) returned {accepted}"
+            played[k] += accepted
+            errors = compare_batch(reference, batch, k, full=(step % full_every == 0))
+            assert not errors, f"game {k}:\n" + "\n".join(errors) + "\n" + str(reference)
+            checked += 1
+        step += 1
+    return checked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential test of an alternative engine against Goban.Board")
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES), default="bit")
+    parser.add_argument("-n", "--games", type=int, default=1000, help="number of random games (over all sizes)")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 7, 8, 9])
+    parser.add_argument("--full-every", type=int, default=1,
+                        help="compare legal moves and scores every N moves only (they are costly on Goban.Board)")
+    args = parser.parse_args()
+
+    old_size = Goban.Board._BOARDSIZE
+    rng = random.Random(args.seed)
+    positions = 0
+    if args.engine == "batch":
+        for i, size in enumerate(args.sizes):
+            Goban.Board._BOARDSIZE = size
+            try:
+                positions += random_batch(len(range(i, args.games, len(args.sizes))), rng, args.full_every)
+            except AssertionError as e:
+                print(f"{size}x{size} games differ:\n{e}")
+                sys.exit(1)
+    else:
+        for g in range(args.games):
+            Goban.Board._BOARDSIZE = args.sizes[g % len(args.sizes)]
+            try:
+                positions += random_game(ENGINES[args.engine], rng, args.full_every)
+            except AssertionError as e:
+                print(f"Game {g} ({Goban.Board._BOARDSIZE}x{Goban.Board._BOARDSIZE}) differs:\n{e}")
+                sys.exit(1)
+    Goban.Board._BOARDSIZE = old_size
+    print(f"{args.games} games, {positions} positions: no difference")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+''' LRU cache of the evaluations of the network of deepml.py.
+
+The key is the smallest of the Zobrist hashes of the 8 symmetric boards (Goban.Board.canonical_hash) and the player
+to move, so rotated or reflected positions share the same entry. The cache is bounded by an estimation of
+its memory use (about ENTRY_BYTES per entry, measured with tracemalloc on an OrderedDict of int -> float).
+'''
+import sys
+from collections import OrderedDict
+
+ENTRY_BYTES = 170
+
+
+class EvalCache:
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self._entries = OrderedDict()
+        self._maxEntries = max(1, max_bytes // ENTRY_BYTES)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(board):
+        return (board.canonical_hash() << 1) | (board.next_player() == board._WHITE)
+
+    def get(self, key):
+        ''' Returns the cached value (the entry becomes the most recently used one) or None.'''
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._maxEntries:
+            self._entries.popitem(last=False) # least recently used
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def print_stats(self, file=None):
+        file = file or sys.stderr # looked up at call time, so redirect_stderr applies
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        print(f"Eval cache: {len(self._entries)} entries, {self.hits} hits ({rate:.1%}), {self.misses} misses",
+              file=file)
@@ -4,26 +4,20 @@ myPlayer class.
 
 Right now, this class contains the copy of the randomPlayer. But you have to change this!
 '''
-import operator
-import signal
 import sys
 import time
 from functools import lru_cache
 
 import Goban
+from CompactGoban import CompactBoard
+from deadline import Deadline, OutOfTimeException
+from openingbook import OpeningBook
+import parallel
+from transposition import TranspositionTable
 from random import choice
 from playerInterface import *
 
 
-class OutOfTimeException(Exception):
-    pass
-
-
-def out_of_time_handler(signum, frame):
-    print("Time is over", file=sys.stderr)
-    raise OutOfTimeException
-
-
 class myPlayer(PlayerInterface):
     ''' Example of a random player for the go. The only tricky part is to be able to handle
     the internal representation of moves given by legal_moves() and used by push() and
@@ -31,9 +25,23 @@ class myPlayer(PlayerInterface):
 
     '''
 
-    def __init__(self):
+    def __init__(self, workers=1, verbose=False):
         self._board = Goban.Board()
         self._mycolor = None
+        self._verbose = verbose  # Stats of the book and the tables after each move (also with --profile)
+        self._workers = workers  # More than 1: the root moves are searched by a process pool (see parallel.py)
+        self._pool = None
+        self._book = OpeningBook.load()  # None if there is no book.npy (see openingbook.py)
+        self._lastValue = "unknown"  # Value of the last iter_deep search
+        self._table = TranspositionTable()
+        self._killers = {}  # ply -> the last 2 moves that caused a cutoff at this ply
+        self._history = {}  # (color, move) -> history heuristic score
+        self._nodes = 0
+        self._searchNodes = 0  # Nodes of the last iter_deep search (all depths)
+        self._searchDepth = 0
+        self._deadline = None
+        self._firstMoveTime = 0  # Time taken by the first root move of the last depth
+        self._interrupted = False
 
     def getPlayerName(self):
         return "Gardener"
@@ -44,8 +52,19 @@ class myPlayer(PlayerInterface):
             return "PASS"
 
         # 1 is black player (first to play), 2 is white player (2nd to play)
-        move = self.iter_deep(self._board, 2, max if self._mycolor == 1 else min)
+        book = None
+        if self._book is not None:
+            book = self._book.lookup(self._board)
+        if book is not None and book[0] in self._board.legal_moves():
+            move = book[0]
+            print(f"Book move {Goban.Board.flat_to_name(move)} (score {book[1]})", file=sys.stderr)
+        elif self._workers > 1:
+            move = self.iter_deep_parallel(self._board, 2, max if self._mycolor == 1 else min)
+        else:
+            move = self.iter_deep(self._board, 2, max if self._mycolor == 1 else min)
         self._board.push(move)
+        if self._verbose or Goban.Board.profiling_enabled(): # as the Goban.Board counters of --profile
+            self.print_stats()
 
         # New here: allows to consider internal representations of moves
         print("I am playing ", self._board.move_to_str(move))
@@ -54,6 +73,12 @@ class myPlayer(PlayerInterface):
         # move is an internal representation. To communicate with the interface I need to change if to a string
         return Goban.Board.flat_to_name(move)
 
+    def print_stats(self):
+        ''' Hits of the opening book and the transposition table so far, on stderr.'''
+        if self._book is not None:
+            self._book.print_stats()
+        self._table.print_stats()
+
     def playOpponentMove(self, move):
         print("Opponent played ", move) # New here
         # the board needs an internal represetation to push the move.  Not a string
@@ -62,86 +87,181 @@ class myPlayer(PlayerInterface):
     def newGame(self, color):
         self._mycolor = color
         self._opponent = Goban.Board.flip(color)
+        self._table.clear()
+        self._history = {}
 
     def endGame(self, winner):
         if self._mycolor == winner:
             print("I won!!!")
         else:
             print("I lost :(!!")
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
 
     def iter_deep(self, board, available_time, selector=max):
-        signal.signal(signal.SIGALRM, out_of_time_handler)
-        signal.alarm(available_time)
+        ''' Iterative deepening within available_time seconds (a float). The time is checked by the search itself
+        (see deadline.py): an unfinished depth still gives its best move if its first root move (the previous best
+        one) was searched. A new depth is only started if the time left is enough to search its first move, as
+        estimated from the previous depths.'''
+        self._deadline = deadline = Deadline(available_time)
+        self._table.new_search()
+        self._killers = {}
+        for k in self._history:  # Older searches count less
+            self._history[k] //= 2
 
         best_estimation = choice(list(board.legal_moves()))
 
         depth = 1
-        time_took = 0
         reached_end = False
         board_value = "unknown"
-        try:
-            while available_time > time_took and not reached_end:
-                start = time.perf_counter()
-                best_estimation, reached_end, board_value = self.max_alpha(board, depth, selector=selector)
-                end = time.perf_counter()
-                time_took += end - start
-                depth += 1
-
-            signal.alarm(0)
-        except OutOfTimeException as ignored:
-            pass
+        nodes_per_depth = []
+        depth_times = []
+        self._searchNodes = 0
+        while not reached_end:
+            if len(depth_times) >= 2:  # The search time grows by about the same factor at each depth
+                estimate = self._firstMoveTime * depth_times[-1] / max(depth_times[-2], 1e-6)
+                if deadline.remaining() < estimate:
+                    break
+            start = deadline.elapsed()
+            self._nodes = 0
+            best_estimation, reached_end, board_value = self.max_alpha(board, depth, selector=selector,
+                                                                       first=best_estimation)
+            if self._interrupted:
+                nodes_per_depth.append(f"{self._nodes} (interrupted)")
+                self._searchNodes += self._nodes
+                break
+            depth_times.append(deadline.elapsed() - start)
+            nodes_per_depth.append(self._nodes)
+            self._searchNodes += self._nodes
+            depth += 1
 
         print(
-            f"iter_deep took {time_took} seconds, reached depth {depth} ({reached_end=}), board estimated : {board_value}.", file=sys.stderr)
+            f"iter_deep took {deadline.elapsed()} seconds, reached depth {depth} ({reached_end=}), board estimated : {board_value}.", file=sys.stderr)
+        print("nodes per depth: " + ", ".join(f"{d}: {n}" for d, n in enumerate(nodes_per_depth, 1)), file=sys.stderr)
+        self._lastValue = board_value
         return best_estimation
 
-    def max_alpha(self, board, depth, selector=min):
+    def order_moves(self, board, moves, first, ply):
+        ''' Sorts the moves in place: first (best move of the previous iteration, or from the transposition table),
+        then the killer moves of this ply, then by history score.'''
+        killers = self._killers.get(ply, ())
+        color = board.next_player()
+        history = self._history
+
+        def score(move):
+            if move == first:
+                return 1 << 60
+            if move in killers:
+                return (1 << 50) - killers.index(move)
+            return history.get((color, move), 0)
+
+        moves.sort(key=score, reverse=True)
+
+    def record_cutoff(self, board, move, depth, ply):
+        ''' The move caused a cutoff: it becomes a killer move of this ply and its history score is raised.'''
+        killers = self._killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        key = (board.next_player(), move)
+        self._history[key] = self._history.get(key, 0) + depth * depth
+
+    def iter_deep_parallel(self, board, available_time, selector=max):
+        ''' Same as iter_deep, but the root moves of each depth are searched by the workers of the process pool
+        (see parallel.iter_deep).'''
+        if self._pool is None:
+            self._pool = parallel.SearchPool(__name__, self._workers)
+        return parallel.iter_deep(self._pool, board, available_time, selector)
+
+    def search_moves(self, state, moves, depth, selector, end_time):
+        ''' Worker side of iter_deep_parallel: searches the given root moves from the state (see
+        Goban.Board.get_state) before end_time, with parallel.alpha_beta_moves.'''
+        board = self._board
+        board.set_state(state)
+        self._searchDepth = depth
+        self._deadline = Deadline(end_time - time.time())
+        return parallel.alpha_beta_moves(board, moves, depth, selector, self.alpha_beta)
+
+    def max_alpha(self, board, depth, selector=min, first=None):
         def swap():
             return min if selector == max else max
 
-        board = Goban.Board(board)
+        board = CompactBoard(board)  # cheap copies and snapshots for the search
+        self._searchDepth = depth
         reached_end = True  # Only used if there are no legal moves
         best_board = 0
-        values = []
-        for move in board.legal_moves():
-            board.push(move)
-            value, reached_end, best_board = self.alpha_beta(board, depth - 1, selector=swap())
-            board.pop()
-            values.append((value, move))
-
-        extremum = selector(values, key=operator.itemgetter(0))[0]
-        return choice(list(filter(lambda v: v[0] == extremum, values)))[1], reached_end, best_board
+        moves = board.legal_moves()
+        self.order_moves(board, moves, first, 0)
+
+        # The first move gets the full window, the others only have to prove they are strictly better
+        alpha, beta = -10e10, 10e10
+        best_value, best_move = None, None
+        self._interrupted = False
+        start = self._deadline.elapsed()
+        try:
+            for move in moves:
+                board.push(move)
+                value, reached_end, best_board = self.alpha_beta(board, depth - 1, alpha, beta, selector=swap())
+                board.pop()
+                if best_move is None:
+                    self._firstMoveTime = self._deadline.elapsed() - start
+                if best_move is None or (value > best_value if selector == max else value < best_value):
+                    best_value, best_move = value, move
+                    if selector == max:
+                        alpha = value
+                    else:
+                        beta = value
+        except OutOfTimeException:
+            # Best move among the ones searched so far (the board copy is dropped with its pushed moves)
+            self._interrupted = True
+            if best_move is None:
+                return first, False, "unknown"
+
+        return best_move, reached_end, best_value
 
     def alpha_beta(self, board, depth, alpha=-10e10, beta=10e10, selector=max):
         def swap():
             return min if selector == max else max
 
+        self._nodes += 1
+        self._deadline.check()
         if depth <= 0 or board.is_game_over():
             h = self.heuristique(board)
             return h, False, h  # Broken, for now assume we never end.
 
-        values = []
+        # Same position already searched (maybe through another move order)
+        key = TranspositionTable.key(board)
+        value, table_move = self._table.lookup(key, depth, alpha, beta)
+        if value is not None:
+            return value, False, value
+        window = (alpha, beta)
+
+        ply = self._searchDepth - depth
+        moves = board.legal_moves()
+        self.order_moves(board, moves, table_move, ply)
+
         reached_end = True  # Only used if there are no legal moves
         best_board = 0
-        for move in board.legal_moves():
+        extremum, best_move = None, None
+        for move in moves:
             board.push(move)
             value, reached_end, best_board = self.alpha_beta(board, depth - 1, alpha, beta, selector=swap())
 
             board.pop()
 
+            if best_move is None or (value > extremum if selector == max else value < extremum):
+                extremum, best_move = value, move
+
             if selector == min:  # min : enemy is choosing, we update upper_bound (beta)
                 beta = min(beta, value)
-                if alpha >= beta:
-                    return value, reached_end, best_board
             else:  # max : ally is choosing, we update lower_bound (alpha)
                 alpha = max(alpha, value)
-                if alpha >= beta:
-                    return value, reached_end, best_board
-
-            values.append(value)
-
-        extremum = selector(values)
+            if alpha >= beta:
+                self.record_cutoff(board, move, depth, ply)
+                break
 
+        self._table.store(key, depth, extremum, best_move, *window)
         return extremum, reached_end, best_board
 
     # Very COSTLY
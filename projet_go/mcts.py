@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+''' Monte Carlo Tree Search (UCT) player.
+
+The tree is descended with push/pop on one board and built with the weak legal moves of the nodes (the moves that
+push refuses for superKo are dropped). Each simulation ends with a random playout on a copy of the board, played
+with weak_legal_moves() and push_lazy() (a playout never fills its own eyes). The search runs until the wall-clock
+budget is spent, and the subtree of the played moves is kept for the next search.
+'''
+import math
+import random
+import sys
+import time
+
+import Goban
+from CompactGoban import CompactBoard
+from parallel import SearchPool
+from playerInterface import *
+
+
+class Node:
+    ''' A node of the search tree. wins are counted for the player that played the move leading to this node.'''
+    __slots__ = ("move", "color", "parent", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, color, parent=None):
+        self.move = move
+        self.color = color
+        self.parent = parent
+        self.children = []
+        self.untried = None  # Moves not expanded yet, filled on the first visit
+        self.visits = 0
+        self.wins = 0.
+
+    def select_child(self, exploration):
+        log_visits = math.log(self.visits)
+        return max(self.children,
+                   key=lambda c: c.wins / c.visits + exploration * math.sqrt(log_visits / c.visits))
+
+    def child(self, move):
+        for c in self.children:
+            if c.move == move:
+                return c
+        return None
+
+
+class myPlayer(PlayerInterface):
+
+    def __init__(self, budget=2., exploration=1.4, max_playout_moves=200, workers=1):
+        self._board = Goban.Board()
+        self._mycolor = None
+        self._budget = budget
+        self._exploration = exploration
+        self._maxPlayoutMoves = max_playout_moves
+        self._root = None
+        self._workers = workers  # More than 1: root parallel search in a process pool (see parallel.py)
+        self._pool = None
+
+    def getPlayerName(self):
+        return "Forester"
+
+    def getPlayerMove(self):
+        if self._board.is_game_over():
+            print("Referee told me to play but the game is over!")
+            return "PASS"
+
+        if self._workers > 1:
+            move = self.search_parallel(self._board, self._budget)
+        else:
+            move = self.search(self._board, self._budget)
+        self._board.push(move)
+        self._advance(move)
+
+        # New here: allows to consider internal representations of moves
+        print("I am playing ", self._board.move_to_str(move))
+        print("My current board :")
+        self._board.prettyPrint()
+        # move is an internal representation. To communicate with the interface I need to change if to a string
+        return Goban.Board.flat_to_name(move)
+
+    def playOpponentMove(self, move):
+        print("Opponent played ", move) # New here
+        # the board needs an internal represetation to push the move.  Not a string
+        fmove = Goban.Board.name_to_flat(move)
+        self._board.push(fmove)
+        self._advance(fmove)
+
+    def newGame(self, color):
+        self._mycolor = color
+        self._opponent = Goban.Board.flip(color)
+        self._root = None
+
+    def endGame(self, winner):
+        if self._mycolor == winner:
+            print("I won!!!")
+        else:
+            print("I lost :(!!")
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def _advance(self, move):
+        ''' Keeps the subtree of the played move (if it was explored) as the root of the next search.'''
+        if self._root is not None:
+            self._root = self._root.child(move)
+            if self._root is not None:
+                self._root.parent = None
+
+    def search(self, board, budget):
+        ''' Runs simulations from the board until the budget (in seconds) is spent and returns the most visited
+        move.'''
+        if self._root is None:
+            self._root = Node(None, Goban.Board.flip(board.next_player()))
+        root = self._root
+        reused = root.visits
+        playouts, elapsed = self.run(board, root, budget)
+
+        best = max(root.children, key=lambda c: c.visits)
+        print(f"MCTS: {playouts} playouts in {elapsed:.2f} seconds ({playouts / elapsed:.0f} playouts/s), "
+              f"{reused} reused, best {Goban.Board.flat_to_name(best.move)} visited {best.visits} times, "
+              f"winning {best.wins / best.visits:.1%}", file=sys.stderr)
+        return best.move
+
+    def run(self, board, root, budget):
+        ''' Runs simulations from root until budget seconds are spent. Returns (playouts, elapsed).'''
+        start = time.perf_counter()
+        playouts = 0
+        board = CompactBoard(board)  # the tree is descended on it, and each playout copies it
+        while True:
+            self.simulate(board, root)
+            playouts += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= budget:
+                return playouts, elapsed
+
+    def search_parallel(self, board, budget):
+        ''' Root parallel search: each worker of the pool grows its own tree and the visits of the root moves are
+        summed. The trees are not kept between moves in this mode.'''
+        if self._pool is None:
+            self._pool = SearchPool(__name__, self._workers, budget=self._budget, exploration=self._exploration,
+                                    max_playout_moves=self._maxPlayoutMoves)
+        start = time.perf_counter()
+        stats, playouts = self._pool.search_root(board, budget)
+        elapsed = time.perf_counter() - start
+        move, (visits, wins) = max(stats.items(), key=lambda s: s[1][0])
+        print(f"MCTS: {playouts} playouts in {elapsed:.2f} seconds ({playouts / elapsed:.0f} playouts/s, "
+              f"{self._workers} workers), best {Goban.Board.flat_to_name(move)} visited {visits} times, "
+              f"winning {wins / visits:.1%}", file=sys.stderr)
+        return move
+
+    def search_root(self, state, budget):
+        ''' Worker side of search_parallel: searches from the state (see Goban.Board.get_state) with a new tree.
+        Returns ([(move, visits, wins)] of the root children, playouts).'''
+        self._board.set_state(state)
+        root = Node(None, Goban.Board.flip(self._board.next_player()))
+        playouts, _ = self.run(self._board, root, budget)
+        return [(c.move, c.visits, c.wins) for c in root.children], playouts
+
+    def simulate(self, board, root):
+        ''' One simulation: selection, expansion, random playout and backpropagation. The tree is descended with
+        push/pop on the board, that is only copied for the playout.'''
+        node = root
+        pushed = 0
+        # Selection
+        while node.untried is not None and not node.untried and node.children:
+            node = node.select_child(self._exploration)
+            board.push(node.move)
+            pushed += 1
+        # Expansion
+        if not board.is_game_over():
+            if node.untried is None:
+                node.untried = board.weak_legal_moves() # the superKo is checked by push, when a move is expanded
+                random.shuffle(node.untried)
+            color = board.next_player()
+            while node.untried:
+                move = node.untried.pop()
+                pushed += 1
+                if board.push(move):
+                    child = Node(move, color, node)
+                    node.children.append(child)
+                    node = child
+                    break
+                board.pop() # superKo, dropped
+                pushed -= 1
+        # Playout
+        winner = self.playout(CompactBoard(board))
+        for _ in range(pushed):
+            board.pop()
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if node.color == winner:
+                node.wins += 1
+            elif winner is None:
+                node.wins += .5
+            node = node.parent
+
+    def playout(self, board):
+        ''' Plays random moves until the end of the game (or max_playout_moves) and returns the winner (None on a
+        deuce).'''
+        for _ in range(self._maxPlayoutMoves):
+            if board.is_game_over():
+                break
+            color = board.next_player()
+            moves = board.weak_legal_moves()
+            moves.pop() # the pass, only played when nothing else is possible
+            played = False
+            while moves:
+                i = random.randrange(len(moves))
+                m = moves[i]
+                moves[i] = moves[-1]
+                moves.pop()
+                if not board._is_an_eye(m, color) and board.push_lazy(m):
+                    played = True
+                    break
+            if not played:
+                board.push_lazy(-1)
+        black, white = board.compute_score()
+        if black > white:
+            return Goban.Board._BLACK
+        if white > black:
+            return Goban.Board._WHITE
+        return None
@@ -6,6 +6,15 @@ import time
 from io import StringIO
 import sys
 
+# --profile (or --profile=json): counts the calls and time of the main Goban.Board methods for each player
+profiling = None
+for arg in list(sys.argv[1:]):
+    if arg.startswith("--profile"):
+        profiling = "json" if arg == "--profile=json" else "table"
+        sys.argv.remove(arg)
+if profiling is not None:
+    Goban.Board.enable_profiling()
+
 def fileorpackage(name):
     if name.endswith(".py"):
         return name[:-3]
@@ -32,6 +41,7 @@ player2.newGame(Goban.Board._WHITE)
 players.append(player2)
 
 totalTime = [0,0] # total real time for each player
+profiles = [{}, {}] # Goban.Board profiling counters for each player
 nextplayer = 0
 nextplayercolor = Goban.Board._BLACK
 nbmoves = 1
@@ -53,7 +63,9 @@ while not b.is_game_over():
     
     currentTime = time.time()
     sys.stdout = stringio
+    before = Goban.Board.profile_snapshot()
     move = players[nextplayer].getPlayerMove() # The move must be given by "A1", ... "J8" string coordinates (not as an internal move)
+    Goban.Board.profile_accumulate(profiles[nextplayer], before, Goban.Board.profile_snapshot())
     sys.stdout = sysstdout
     playeroutput = stringio.getvalue()
     stringio.truncate(0)
@@ -69,7 +81,9 @@ while not b.is_game_over():
         wrongmovefrom = nextplayercolor
         break
     b.push(Goban.Board.name_to_flat(move)) # Here I have to internally flatten the move to be able to check it.
+    before = Goban.Board.profile_snapshot()
     players[otherplayer].playOpponentMove(move)
+    Goban.Board.profile_accumulate(profiles[otherplayer], before, Goban.Board.profile_snapshot())
  
     nextplayer = otherplayer
     nextplayercolor = othercolor
@@ -78,6 +92,10 @@ print("The game is over")
 b.prettyPrint()
 result = b.result()
 print("Time:", totalTime)
+if profiling is not None:
+    for i, player in enumerate(players):
+        print(f"Profile of player {i} ({player.getPlayerName()}):")
+        print(Goban.Board.profile_report(profiles[i], as_json=profiling == "json"))
 print("GO Score:", b.final_go_score())
 print("Winner: ", end="")
 if wrongmovefrom > 0:
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+''' Opening book: best moves of the first positions of the game, searched offline.
+
+The book is a .npy file of entries (key, move, score) sorted by key, where key is the canonical hash of the position
+(see Goban.Board.canonical_hash) with the player to move, and move is expressed on the canonical board. The players
+open it with np.load(mmap_mode='r') and look positions up with a binary search on the mapped file: nothing is read
+at startup and the entries never become Python objects.
+
+    python3 openingbook.py                  --> book.npy, all the positions up to 2 plies, 5 seconds of iterdeep each
+    python3 openingbook.py -p 3 -t 10 -o deep_book.npy
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+import Goban
+
+ENTRY = np.dtype([('key', '<u8'), ('move', '<i2'), ('score', '<f4')])
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.npy")
+
+
+def book_key(board):
+    return (board.canonical_hash() << 1) | (board.next_player() == Goban.Board._WHITE)
+
+
+class OpeningBook:
+
+    def __init__(self, path=DEFAULT_PATH):
+        self._entries = np.load(path, mmap_mode='r')
+        self._keys = self._entries['key']
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def load(path=DEFAULT_PATH):
+        ''' Returns the book, or None if there is no book file (the players then always search).'''
+        if not os.path.exists(path):
+            return None
+        return OpeningBook(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _find(self, key):
+        lo, hi = 0, len(self._keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._keys[mid] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._keys) and self._keys[lo] == key:
+            return lo
+        return None
+
+    def lookup(self, board):
+        ''' Returns (move, score) for the board (the move is a flat move of this board), or None.'''
+        i = self._find(np.uint64(book_key(board)))
+        if i is None:
+            self.misses += 1
+            return None
+        entry = self._entries[i]
+        move = int(entry['move'])
+        if move != -1: # back from the canonical board
+            move = int(np.flatnonzero(Goban.Board.symmetries()[board.canonical_symmetry()] == move)[0])
+        self.hits += 1
+        return move, float(entry['score'])
+
+    def print_stats(self, file=None):
+        file = file or sys.stderr # looked up at call time, so redirect_stderr applies
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        print(f"Book: {len(self)} positions, {self.hits} hits ({rate:.1%}), {self.misses} misses", file=file)
+
+
+def build(plies, available_time, output):
+    ''' Searches all the positions reachable in at most plies moves (symmetric positions are searched once) with
+    iterdeep's iter_deep, and writes the sorted book. The positions whose search did not give a value (no depth
+    completed) are left out of the book.'''
+    import iterdeep
+    player = iterdeep.myPlayer()
+    player.newGame(Goban.Board._BLACK)
+    entries = {}
+    level = [Goban.Board()]
+    queued = {book_key(level[0])}
+    start = time.perf_counter()
+    for ply in range(plies + 1):
+        next_level = []
+        for board in level:
+            if board.is_game_over():
+                continue
+            selector = max if board.next_player() == Goban.Board._BLACK else min
+            move = player.iter_deep(board, available_time, selector)
+            if move != -1:
+                move = int(Goban.Board.symmetries()[board.canonical_symmetry()][move])
+            value = player._lastValue
+            if not isinstance(value, str): # "unknown": the search did not complete any depth
+                entries[book_key(board)] = (move, value)
+            if ply < plies:
+                for m in board.legal_moves():
+                    child = Goban.Board(board)
+                    child.push(m)
+                    key = book_key(child)
+                    if key not in queued: # symmetric positions are searched once
+                        queued.add(key)
+                        next_level.append(child)
+        print(f"ply {ply}: {len(entries)} positions in the book ({time.perf_counter() - start:.0f} seconds)",
+              file=sys.stderr)
+        level = next_level
+
+    book = np.array([(k, m, s) for k, (m, s) in sorted(entries.items())], dtype=ENTRY)
+    np.save(output, book)
+    return len(book)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the opening book of the Go players")
+    parser.add_argument("-p", "--plies", type=int, default=2, help="depth of the book, in moves from the start")
+    parser.add_argument("-t", "--time", type=float, default=5., help="search time per position, in seconds")
+    parser.add_argument("-o", "--output", default=DEFAULT_PATH)
+    args = parser.parse_args()
+    n = build(args.plies, args.time, args.output)
+    print(f"{n} positions written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
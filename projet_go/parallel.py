@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+''' Process pool for the search players (iterdeep.py, deepml.py, mcts.py).
+
+The workers are forked once (when the player is built with workers > 1) and each of them builds its own player of
+the same module, thus its own Board (and model for deepml). Positions are sent with Board.get_state() rather than
+pickled boards, and results come back as plain lists.
+
+    - root parallel alpha-beta: the root moves are split between the workers (search_moves of the player), driven
+      by iter_deep for all the alpha-beta players, the workers searching their moves with alpha_beta_moves,
+    - root parallel MCTS: every worker runs its own tree for the budget and the root visits are summed (search_root
+      of the player).
+'''
+import importlib
+import multiprocessing
+import operator
+import random
+import sys
+import time
+from random import choice
+
+from deadline import OutOfTimeException
+
+_player = None # The player of the worker process
+
+
+def _init_worker(module, kwargs):
+    global _player
+    random.seed() # Forked workers would otherwise all play the same random playouts and choices
+    _player = importlib.import_module(module).myPlayer(**kwargs)
+
+
+def _search_moves(task):
+    state, moves, depth, selector, end_time = task
+    return _player.search_moves(state, moves, depth, selector, end_time)
+
+
+def _search_root(task):
+    state, budget = task
+    return _player.search_root(state, budget)
+
+
+class SearchPool:
+
+    def __init__(self, module, workers, **kwargs):
+        ''' Starts the workers, each one with its own module.myPlayer(**kwargs) (always single process).'''
+        self.workers = workers
+        self._pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(module, kwargs))
+
+    def search_moves(self, board, moves, depth, selector, end_time):
+        ''' Searches the root moves at the given depth in the workers, the moves being dealt round-robin (so the
+        first moves of an ordered list go to different workers). Returns the (value, move) pairs of the moves
+        searched before end_time (a time.time() value), in no particular order.'''
+        state = board.get_state()
+        tasks = [(state, moves[w::self.workers], depth, selector, end_time) for w in range(self.workers)]
+        values = []
+        for chunk in self._pool.map(_search_moves, [t for t in tasks if t[1]]):
+            values.extend(chunk)
+        return values
+
+    def search_root(self, board, budget):
+        ''' Runs one search per worker for budget seconds. Returns ({move: (visits, wins)}, total playouts).'''
+        state = board.get_state()
+        stats = {}
+        playouts = 0
+        for children, n in self._pool.map(_search_root, [(state, budget)] * self.workers):
+            playouts += n
+            for move, visits, wins in children:
+                v, w = stats.get(move, (0, 0.))
+                stats[move] = (v + visits, w + wins)
+        return stats, playouts
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+
+def iter_deep(pool, board, available_time, selector=max):
+    ''' Iterative deepening of the alpha-beta players with the root moves of each depth searched by the workers of
+    the pool. The moves are sorted by the values of the previous depth, so that the best ones are searched first.
+    Returns the best move.'''
+    start = time.time()
+    end_time = start + available_time
+
+    moves = board.legal_moves()
+    best_estimation = choice(moves)
+    board_value = "unknown"
+    depth = 1
+    while time.time() < end_time:
+        values = pool.search_moves(board, moves, depth, selector, end_time)
+        if len(values) < len(moves):
+            # Unfinished depth: its best move is only kept if it was compared to the previous best one
+            if values and best_estimation in (m for _, m in values):
+                board_value, best_estimation = selector(values, key=operator.itemgetter(0))
+            break
+        board_value, best_estimation = selector(values, key=operator.itemgetter(0))
+        moves = [m for _, m in sorted(values, key=operator.itemgetter(0), reverse=selector == max)]
+        depth += 1
+
+    print(f"iter_deep_parallel ({pool.workers} workers) took {time.time() - start} seconds, reached depth {depth}, "
+          f"board estimated : {board_value}.", file=sys.stderr)
+    return best_estimation
+
+
+def alpha_beta_moves(board, moves, depth, selector, alpha_beta):
+    ''' Worker side of iter_deep: searches the root moves with alpha_beta(board, depth, alpha, beta, selector) (the
+    search of the player, which must raise OutOfTimeException at its deadline) and returns the (value, move) pairs
+    of the moves searched in time. Only the best value is exact, the window is narrowed after it so the others may
+    be bounds.'''
+    swapped = min if selector == max else max
+    alpha, beta = -10e10, 10e10
+    values = []
+    try:
+        for move in moves:
+            board.push(move)
+            value, _, _ = alpha_beta(board, depth - 1, alpha, beta, selector=swapped)
+            board.pop()
+            values.append((value, move))
+            if selector == max:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+    except OutOfTimeException:
+        pass
+    return values
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+''' Perft for Goban.Board: counts the leaves of the tree of legal moves (push/pop) of a given depth, like
+depth_search in td1/starter-chess.py. The counts of the empty boards are stored in REFERENCE, so an optimisation of
+the engine can be checked (same counts) and timed (leaves per second) in one run.
+
+A game stops after two passes, so a finished game is a leaf even before the depth. In the deduplicated count, the
+leaves reached by several move orders are counted once (same Zobrist hash and same player to move).
+
+    python3 perft.py                    --> checks all the reference counts, with the leaves per second
+    python3 perft.py -s 7 -d 3          --> perft 3 of the empty 7x7 board
+    python3 perft.py -s 5 -d 3 --divide --> same, per first move
+    python3 perft.py -s 5 -d 4 --unique --> also the number of distinct leaves
+'''
+import argparse
+import sys
+import time
+
+import Goban
+
+# size -> perft counts of the empty board for depth 1, 2, ...
+REFERENCE = {
+    5: [26, 651, 15651, 361067],
+    7: [50, 2451, 117699],
+    8: [65, 4161, 262209],
+}
+
+
+def perft(board, depth):
+    ''' Number of leaves of the tree of legal moves of the given depth.'''
+    if depth == 0 or board.is_game_over():
+        return 1
+    if depth == 1:
+        return len(board.legal_moves())
+    nodes = 0
+    for m in board.legal_moves():
+        board.push(m)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def divide(board, depth):
+    ''' The perft count below each legal move, as {move name: leaves}.'''
+    counts = {}
+    for m in board.legal_moves():
+        board.push(m)
+        counts[Goban.Board.flat_to_name(m)] = perft(board, depth - 1)
+        board.pop()
+    return counts
+
+
+def perft_unique(board, depth, leaves=None):
+    ''' Number of distinct leaves (by Zobrist hash and player to move) of the tree of the given depth.'''
+    if leaves is None:
+        leaves = set()
+    if depth == 0 or board.is_game_over():
+        leaves.add((int(board._currentHash), board.next_player()))
+    else:
+        for m in board.legal_moves():
+            board.push(m)
+            perft_unique(board, depth - 1, leaves)
+            board.pop()
+    return len(leaves)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def check(sizes=None, max_depth=None):
+    ''' Compares perft of the empty boards with REFERENCE. Returns True if all the counts are the same.'''
+    ok = True
+    old_size = Goban.Board._BOARDSIZE
+    try:
+        for size, counts in REFERENCE.items():
+            if sizes is not None and size not in sizes:
+                continue
+            Goban.Board._BOARDSIZE = size
+            for depth, expected in enumerate(counts, 1):
+                if max_depth is not None and depth > max_depth:
+                    break
+                nodes, elapsed = timed(perft, Goban.Board(), depth)
+                status = "ok" if nodes == expected else f"WRONG (expected {expected})"
+                ok = ok and nodes == expected
+                print(f"{size}x{size} perft {depth}: {nodes} {status}, {elapsed:.2f} seconds "
+                      f"({nodes / elapsed:.0f} leaves/s)")
+    finally:
+        Goban.Board._BOARDSIZE = old_size
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft counts of Goban.Board")
+    parser.add_argument("-s", "--size", type=int, default=None, help="board size (default: all the reference sizes)")
+    parser.add_argument("-d", "--depth", type=int, default=None, help="perft depth (default: all the reference depths)")
+    parser.add_argument("--divide", action="store_true", help="counts per first move")
+    parser.add_argument("--unique", action="store_true", help="also count the distinct leaves")
+    args = parser.parse_args()
+
+    if args.size is None or args.depth is None:
+        sys.exit(0 if check(None if args.size is None else [args.size], args.depth) else 1)
+
+    Goban.Board._BOARDSIZE = args.size
+    board = Goban.Board()
+    if args.divide:
+        for name, nodes in divide(board, args.depth).items():
+            print(f"{name}: {nodes}")
+    nodes, elapsed = timed(perft, board, args.depth)
+    print(f"{args.size}x{args.size} perft {args.depth}: {nodes}, {elapsed:.2f} seconds ({nodes / elapsed:.0f} leaves/s)")
+    expected = REFERENCE.get(args.size, [])
+    if args.depth <= len(expected) and nodes != expected[args.depth - 1]:
+        print(f"WRONG, expected {expected[args.depth - 1]}")
+    if args.unique:
+        unique, elapsed = timed(perft_unique, board, args.depth)
+        print(f"{unique} distinct leaves, {elapsed:.2f} seconds")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+''' Match series between two player modules, stopped by a sequential probability ratio test (SPRT).
+
+H0: player1 is elo0 Elo stronger than player2 (usually 0), H1: it is elo1 Elo stronger. After each game the
+log-likelihood ratio of the results (wins 1, deuces 0.5, losses 0; normal approximation of the generalized SPRT) is
+compared to the bounds given by alpha and beta, and the series stops as soon as one of the hypotheses is accepted.
+The Elo difference is reported with its 95% confidence interval.
+
+Results are appended to a JSONL file (same lines as tournament.py), and the games of the same two modules already
+in it are counted again when the series is restarted.
+
+    python3 sprt.py iterdeep deepml                       --> elo0=0, elo1=30, alpha=beta=0.05, results in sprt.jsonl
+    python3 sprt.py mcts iterdeep --elo1 50 -j 8 --max-games 400 -o mcts_vs_iterdeep.jsonl
+'''
+import argparse
+import json
+import math
+import os
+from multiprocessing import Pool
+
+import tournament
+
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_of_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+class SPRT:
+
+    def __init__(self, elo0=0., elo1=30., alpha=0.05, beta=0.05):
+        self.s0 = expected_score(elo0)
+        self.s1 = expected_score(elo1)
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.wins = self.deuces = self.losses = 0
+
+    def add(self, score):
+        ''' score of player1 in one game: 1, 0.5 or 0.'''
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.deuces += 1
+
+    @property
+    def games(self):
+        return self.wins + self.deuces + self.losses
+
+    def _mean_variance(self):
+        n = self.games
+        mean = (self.wins + 0.5 * self.deuces) / n
+        variance = (self.wins + 0.25 * self.deuces) / n - mean * mean
+        return mean, variance
+
+    def llr(self):
+        if self.games == 0:
+            return 0.
+        mean, variance = self._mean_variance()
+        if variance <= 0: # all the games gave the same score: not informative yet
+            return 0.
+        return self.games * (self.s1 - self.s0) * (2 * mean - self.s0 - self.s1) / (2 * variance)
+
+    def status(self):
+        ''' "H1" (player1 is stronger by elo1), "H0" (not stronger than elo0) or None (keep playing).'''
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def elo(self, z=1.96):
+        ''' Elo difference (player1 - player2) and its confidence interval.'''
+        if self.games == 0:
+            return 0., -math.inf, math.inf
+        mean, variance = self._mean_variance()
+        margin = z * math.sqrt(variance / self.games)
+        return elo_of_score(mean), elo_of_score(mean - margin), elo_of_score(mean + margin)
+
+    def __str__(self):
+        elo, low, high = self.elo()
+        return (f"{self.games} games (+{self.wins} ={self.deuces} -{self.losses}), Elo {elo:+.1f} "
+                f"[{low:+.1f}, {high:+.1f}], LLR {self.llr():.2f} ({self.lower:.2f}, {self.upper:.2f})")
+
+
+def score_of(result, module1):
+    if result["winner"] == "DEUCE":
+        return 0.5
+    return 1 if result["black" if result["winner"] == "BLACK" else "white"] == module1 else 0
+
+
+def load_results(path, module1, module2):
+    ''' Results of the games between the two modules already in the JSONL file.'''
+    results = []
+    if path is not None and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    r = json.loads(line)
+                    if {r["black"], r["white"]} == {module1, module2}:
+                        results.append(r)
+    return results
+
+
+def run(module1, module2, sprt, processes=None, output=None, max_games=1000, verbosity=1):
+    ''' Plays games (keeping one game per process running) until the SPRT is resolved or max_games are played.'''
+    for r in load_results(output, module1, module2):
+        sprt.add(score_of(r, module1))
+    if verbosity >= 1 and sprt.games:
+        print(f"resumed: {sprt}")
+    if sprt.status() is not None or sprt.games >= max_games:
+        return sprt.status()
+
+    schedule = iter(tournament.games_schedule(module1, module2, max_games, first=sprt.games))
+    out = open(output, "a") if output is not None else None
+    processes = processes or os.cpu_count()
+    pool = Pool(processes)
+    try:
+        running = []
+        def start_game():
+            task = next(schedule, None)
+            if task is not None:
+                running.append(pool.apply_async(tournament.play_game, task))
+        for _ in range(processes):
+            start_game()
+        while running and sprt.status() is None:
+            running[0].wait(0.1)
+            for r in [r for r in running if r.ready()]:
+                running.remove(r)
+                result = r.get()
+                if out is not None:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                sprt.add(score_of(result, module1))
+                if verbosity >= 1:
+                    print(sprt)
+                if sprt.status() is None:
+                    start_game()
+    finally:
+        pool.terminate() # the games still running are not needed anymore
+        pool.join()
+        if out is not None:
+            out.close()
+    return sprt.status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SPRT match series between two player modules")
+    parser.add_argument("player1")
+    parser.add_argument("player2")
+    parser.add_argument("--elo0", type=float, default=0., help="Elo difference of H0")
+    parser.add_argument("--elo1", type=float, default=30., help="Elo difference of H1")
+    parser.add_argument("--alpha", type=float, default=0.05, help="false positive rate")
+    parser.add_argument("--beta", type=float, default=0.05, help="false negative rate")
+    parser.add_argument("--max-games", type=int, default=1000)
+    parser.add_argument("-j", "--processes", type=int, default=None, help="games played at the same time")
+    parser.add_argument("-o", "--output", default="sprt.jsonl", help="JSONL results file (also read to resume)")
+    parser.add_argument("-v", "--verbosity", type=int, default=1)
+    args = parser.parse_args()
+
+    module1, module2 = tournament.fileorpackage(args.player1), tournament.fileorpackage(args.player2)
+    sprt = SPRT(args.elo0, args.elo1, args.alpha, args.beta)
+    status = run(module1, module2, sprt, args.processes, args.output, args.max_games, args.verbosity)
+    if status == "H1":
+        print(f"H1 accepted: {module1} is stronger than {module2} (elo1={args.elo1})")
+    elif status == "H0":
+        print(f"H0 accepted: {module1} is not stronger than {module2} by more than elo0={args.elo0}")
+    else:
+        print(f"Unresolved after {sprt.games} games")
+    print(sprt)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import CompactGoban
+import Goban
+from test_goban import play_random
+
+
+def test_deepcopy_pops_the_moves_of_the_original():
+    ''' CompactBoard(b, deepcopy=True) can pop the moves pushed on b, back to the same positions.'''
+    board = CompactGoban.CompactBoard()
+    pushed = play_random(board, 20, 0)
+    copy = CompactGoban.CompactBoard(board, deepcopy=True)
+    for _ in range(pushed):
+        board.pop()
+        copy.pop()
+        assert (copy.get_board() == board.get_board()).all() and copy._currentHash == board._currentHash
+    assert not copy.get_board().any()
+
+
+def test_goban_board_from_a_compact_board():
+    ''' Goban.Board(compact) gets a plain set of empty points, and plays on as the compact board.'''
+    compact = CompactGoban.CompactBoard()
+    play_random(compact, 20, 1)
+    board = Goban.Board(compact)
+    assert type(board._empties) is set
+    assert board._empties == set(compact._empties)
+    play_random(board, 20, 2)
+    play_random(compact, 20, 2)
+    assert (board.get_board() == compact.get_board()).all() and board._currentHash == compact._currentHash
+
+
+def test_goban_board_takes_attributes():
+    ''' Only CompactBoard is slotted: external code can still attach attributes to a Goban.Board.'''
+    board = Goban.Board()
+    board.name = "root"
+    assert board.name == "root"
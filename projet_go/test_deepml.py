@@ -0,0 +1,10 @@
+import Goban
+import deepml
+
+
+def test_iter_deep_out_of_time_returns_a_move():
+    ''' The deadline may expire in the batched evaluation of the depth 1 leaves: the search still returns a move.'''
+    board = Goban.Board()
+    player = deepml.myPlayer()
+    for budget in (1e-6, 1e-4, 1e-3):
+        assert player.iter_deep(board, budget, max) in board.legal_moves()
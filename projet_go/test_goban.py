@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+import Goban
+
+
+def play_random(board, moves, seed):
+    ''' Pushes moves random moves (weak_legal_moves, the refused ones are popped).'''
+    rng = random.Random(seed)
+    pushed = 0
+    while pushed < moves and not board.is_game_over():
+        if board.push(rng.choice(board.weak_legal_moves())):
+            pushed += 1
+        else:
+            board.pop()
+    return pushed
+
+
+def state(board):
+    return (board._board.tobytes(), board._stringUnionFind.tobytes(), board._stringLiberties.tobytes(),
+            board._stringSizes.tobytes(), frozenset(board._empties), board._currentHash, board._symHashes.tobytes(),
+            board._suicideFreeBLACK, board._suicideFreeWHITE, board._enclosed, board._nbBLACK, board._nbWHITE,
+            board._capturedBLACK, board._capturedWHITE, board._nextPlayer, board._lastPlayerHasPassed,
+            board._gameOver, len(board._seenHashes))
+
+
+@pytest.mark.parametrize("trail", [False, True])
+def test_deepcopy_pops_the_moves_of_the_original(monkeypatch, trail):
+    ''' Board(b, deepcopy=True) can pop the moves pushed on b, back to the same positions.'''
+    monkeypatch.setattr(Goban.Board, "_TRAIL_UNDO", trail)
+    board = Goban.Board()
+    pushed = play_random(board, 20, 0)
+    copy = Goban.Board(board, deepcopy=True)
+    for _ in range(pushed):
+        board.pop()
+        copy.pop()
+        assert (copy.get_board() == board.get_board()).all() and copy._currentHash == board._currentHash
+    assert not copy.get_board().any()
+
+
+@pytest.mark.parametrize("size", [7, 8, 9])
+def test_trail_pop_restores_the_state(monkeypatch, size):
+    ''' pop() in trail undo mode gives back exactly the state before push(), through random push/pop sequences.'''
+    monkeypatch.setattr(Goban.Board, "_TRAIL_UNDO", True)
+    monkeypatch.setattr(Goban.Board, "_BOARDSIZE", size)
+    for seed in range(10):
+        rng = random.Random(seed)
+        board = Goban.Board()
+        states = []
+        for _ in range(400):
+            if states and (board.is_game_over() or rng.random() < 0.3):
+                board.pop()
+                assert state(board) == states.pop()
+            else:
+                board.legal_moves() # outside of a frame, the paths of the union find may be rerouted
+                states.append(state(board))
+                board.push(rng.choice(board.weak_legal_moves()))
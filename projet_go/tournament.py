@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+''' Headless tournament between two player modules (each one providing a myPlayer class, as for namedGame.py).
+
+The games are played concurrently in a process pool, the colours alternating from one game to the next. The referee
+only checks the moves (no board printing, no list of the legal moves) and the players' outputs are thrown away
+unless asked with -v. One JSON line is written per game (modules, names, winner, score, per-move times).
+
+    python3 tournament.py iterdeep randomPlayer                 --> 10 games, one process per core
+    python3 tournament.py mcts iterdeep -n 50 -j 4 -o results.jsonl -v 1
+'''
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from multiprocessing import Pool
+
+import Goban
+
+
+def fileorpackage(name):
+    if name.endswith(".py"):
+        return name[:-3]
+    return name
+
+
+def play_game(black_module, white_module, verbosity=0, opening=()):
+    ''' Plays one game and returns its result as a dict. The moves of opening (names) are played first, given to
+    both players as opponent moves. With verbosity < 2, everything the players print is dropped.'''
+    modules = [black_module, white_module]
+    if verbosity >= 2:
+        return _play_game(modules, verbosity, opening)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+        return _play_game(modules, verbosity, opening)
+
+
+def _play_game(modules, verbosity, opening=()):
+    b = Goban.Board()
+    colors = [Goban.Board._BLACK, Goban.Board._WHITE]
+    players = []
+    for module, color in zip(modules, colors):
+        player = importlib.import_module(module).myPlayer()
+        player.newGame(color)
+        players.append(player)
+
+    times = [[], []]
+    moves = []
+    nextplayer = 0
+    wrongmovefrom = 0
+    for move in opening:
+        b.push(Goban.Board.name_to_flat(move))
+        moves.append(move)
+        for player in players:
+            player.playOpponentMove(move)
+        nextplayer = 1 - nextplayer
+    while not b.is_game_over():
+        start = time.perf_counter()
+        move = players[nextplayer].getPlayerMove()
+        times[nextplayer].append(time.perf_counter() - start)
+        fmove = Goban.Board.name_to_flat(move)
+        # weak_legal_moves and the return value of push check the same rules as legal_moves, for less work
+        if fmove not in b.weak_legal_moves() or not b.push(fmove):
+            wrongmovefrom = colors[nextplayer]
+            break
+        moves.append(move)
+        if verbosity >= 2:
+            print(f"[{modules[nextplayer]}] plays {move}", file=sys.__stderr__)
+        nextplayer = 1 - nextplayer
+        players[nextplayer].playOpponentMove(move)
+
+    result = b.result()
+    if wrongmovefrom == Goban.Board._WHITE or (not wrongmovefrom and result == "0-1"):
+        winner = "BLACK"
+    elif wrongmovefrom == Goban.Board._BLACK or (not wrongmovefrom and result == "1-0"):
+        winner = "WHITE"
+    else:
+        winner = "DEUCE"
+    for player, color in zip(players, colors):
+        player.endGame(Goban.Board._BLACK if winner == "BLACK" else Goban.Board._WHITE if winner == "WHITE" else 0)
+    black_score, white_score = b.compute_score()
+    return {"black": modules[0], "white": modules[1],
+            "black_name": players[0].getPlayerName(), "white_name": players[1].getPlayerName(),
+            "winner": winner, "illegal_move": bool(wrongmovefrom), "score": b.final_go_score(),
+            "black_points": black_score, "white_points": white_score, "moves": moves,
+            "black_times": times[0], "white_times": times[1]}
+
+
+def _play_task(task):
+    return play_game(*task)
+
+
+def games_schedule(module1, module2, games, verbosity=0, first=0):
+    ''' The (black, white, verbosity) tasks of the games first..games-1, module1 being black in the even games.'''
+    return [(module1, module2, verbosity) if g % 2 == 0 else (module2, module1, verbosity) for g in range(first, games)]
+
+
+def run(module1, module2, games, processes=None, output=None, verbosity=1):
+    ''' Plays the games in a process pool and returns the list of the results (in the order they finished). They
+    are appended to the output JSONL file as soon as they are known.'''
+    results = []
+    out = open(output, "a") if output is not None else None
+    start = time.perf_counter()
+    try:
+        with Pool(processes) as pool:
+            for r in pool.imap_unordered(_play_task, games_schedule(module1, module2, games, verbosity)):
+                results.append(r)
+                if out is not None:
+                    out.write(json.dumps(r) + "\n")
+                    out.flush()
+                if verbosity >= 1:
+                    print(f"game {len(results)}/{games}: {r['black']} (black) vs {r['white']} (white): "
+                          f"{r['winner']} {r['score']}, {len(r['moves'])} moves, "
+                          f"{sum(r['black_times']):.1f}s / {sum(r['white_times']):.1f}s")
+    finally:
+        if out is not None:
+            out.close()
+    if verbosity >= 1:
+        print(f"{games} games in {time.perf_counter() - start:.1f} seconds")
+    return results
+
+
+def summary(results, module1, module2):
+    ''' Returns (wins of module1, wins of module2, deuces).'''
+    wins1 = wins2 = deuces = 0
+    for r in results:
+        if r["winner"] == "DEUCE":
+            deuces += 1
+        elif r["black" if r["winner"] == "BLACK" else "white"] == module1:
+            wins1 += 1
+        else:
+            wins2 += 1
+    return wins1, wins2, deuces
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays a series of games between two player modules")
+    parser.add_argument("player1")
+    parser.add_argument("player2")
+    parser.add_argument("-n", "--games", type=int, default=10)
+    parser.add_argument("-j", "--processes", type=int, default=None, help="number of games played at the same time "
+                        "(default: number of cores)")
+    parser.add_argument("-o", "--output", default=None, help="JSONL file where the results are appended")
+    parser.add_argument("-v", "--verbosity", type=int, default=1,
+                        help="0: only the summary, 1: one line per game, 2: also the moves and the players' outputs")
+    args = parser.parse_args()
+
+    module1, module2 = fileorpackage(args.player1), fileorpackage(args.player2)
+    results = run(module1, module2, args.games, args.processes, args.output, args.verbosity)
+    wins1, wins2, deuces = summary(results, module1, module2)
+    print(f"{module1} {wins1} - {wins2} {module2} ({deuces} deuces)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+''' Transposition table for the alpha-beta players (iterdeep.py, deepml.py).
+
+Positions are identified by the Zobrist hash maintained by Goban.Board (_currentHash) and the player to move. The
+table has a fixed number of buckets, each bucket holding two entries:
+    - a depth-preferred entry, only replaced by a search at least as deep (or by an older search),
+    - an always-replace entry, that takes every other store.
+'''
+import sys
+
+EXACT = 0
+LOWER = 1 # the value is at least the stored one (beta cutoff)
+UPPER = 2 # the value is at most the stored one (no move reached alpha)
+
+
+class TranspositionTable:
+
+    def __init__(self, bits=16):
+        self._mask = (1 << bits) - 1
+        self._deep = [None] * (self._mask + 1)
+        self._always = [None] * (self._mask + 1)
+        self._generation = 0
+        self.reset_stats()
+
+    @staticmethod
+    def key(board):
+        ''' Cache key of the current position of a Goban.Board (the hash does not contain the player to move).'''
+        return (int(board._currentHash) << 1) | (board._nextPlayer == board._WHITE)
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+        self.stores = 0
+
+    def new_search(self):
+        ''' To call before each new search: entries of older searches can then be replaced in the depth-preferred
+        slots, even by shallower ones.'''
+        self._generation += 1
+        self.reset_stats()
+
+    def clear(self):
+        self._deep = [None] * (self._mask + 1)
+        self._always = [None] * (self._mask + 1)
+        self.reset_stats()
+
+    def probe(self, key):
+        ''' Returns the entry (key, depth, bound, value, move, generation) stored for this key, or None.'''
+        self.probes += 1
+        i = key & self._mask
+        for entry in (self._deep[i], self._always[i]):
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry
+        return None
+
+    def lookup(self, key, depth, alpha, beta):
+        ''' Returns (value, move). value is not None only if the stored entry is deep enough to stop the search
+        with the given window; move is the stored best move (or None) to try first otherwise.'''
+        entry = self.probe(key)
+        if entry is None:
+            return None, None
+        _, edepth, bound, value, move, _ = entry
+        if edepth >= depth and (bound == EXACT or (bound == LOWER and value >= beta)
+                                or (bound == UPPER and value <= alpha)):
+            self.cutoffs += 1
+            return value, move
+        return None, move
+
+    def store(self, key, depth, value, move, alpha, beta):
+        ''' Stores the result of a search done with the window (alpha, beta), the bound type is deduced from it.'''
+        if value <= alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.stores += 1
+        entry = (key, depth, bound, value, move, self._generation)
+        i = key & self._mask
+        deep = self._deep[i]
+        if deep is None or deep[0] == key or depth >= deep[1] or deep[5] != self._generation:
+            if deep is not None and deep[0] != key:
+                self._always[i] = deep # still useful, moved to the always-replace slot
+            self._deep[i] = entry
+        else:
+            self._always[i] = entry
+
+    def print_stats(self, file=None):
+        file = file or sys.stderr # looked up at call time, so redirect_stderr applies
+        rate = self.hits / self.probes if self.probes else 0
+        print(f"TT: {self.probes} probes, {self.hits} hits ({rate:.1%}), {self.cutoffs} cutoffs, "
+              f"{self.stores} stores", file=file)
@@ -1,10 +1,16 @@
 import operator
-import signal
+import os
+import sys
 import time
 
 import chess
 from random import randint, choice
 
+# Le temps limite de la recherche est celui des joueurs de Go (projet_go/deadline.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "projet_go"))
+
+from deadline import Deadline, OutOfTimeException
+
 def randomMove(b):
     '''Renvoie un mouvement au hasard sur la liste des mouvements possibles. Pour avoir un choix au hasard, il faut
     construire explicitement tous les mouvements. Or, generate_legal_moves() nous donne un itérateur.'''
@@ -155,14 +161,12 @@ def minimax(board, depth, selector=max):
     return extremum
 
 
-class OutOfTimeException(Exception):
-    pass
-
-
-def alpha_beta(board, depth, alpha=-10e10, beta=10e10, selector=max):
+def alpha_beta(board, depth, alpha=-10e10, beta=10e10, selector=max, deadline=None):
     def swap():
         return min if selector == max else max
 
+    if deadline is not None:
+        deadline.check()
     if depth <= 0 or board.is_game_over():
         h = heuristique(board)
         return h, board.is_game_over(), h
@@ -172,7 +176,8 @@ def alpha_beta(board, depth, alpha=-10e10, beta=10e10, selector=max):
     best_board = 0
     for move in board.legal_moves:
         board.push(move)
-        value, reached_end, best_board = alpha_beta(board, depth - 1, alpha, beta, selector=swap())
+        value, reached_end, best_board = alpha_beta(board, depth - 1, alpha, beta, selector=swap(),
+                                                    deadline=deadline)
 
         board.pop()
 
@@ -208,52 +213,68 @@ def maximin(board, depth, selector=min):
     return choice(list(filter(lambda v: v[0] == extremum, values)))[1]
 
 
-def max_alpha(board, depth, selector=min):
+def max_alpha(board, depth, selector=min, first=None, deadline=None):
+    ''' With first (the best move of the previous depth) searched first. If the deadline stops the search, the best
+    of the moves already searched is returned and OutOfTimeException is raised only if there are none. Also returns
+    the time taken by the first move.'''
     def swap():
         return min if selector == max else max
     board = board.copy()
     reached_end = True  # Only used if there are no legal moves
     best_board = 0
     values = []
-    for move in board.legal_moves:
-        board.push(move)
-        value, reached_end, best_board = alpha_beta(board, depth - 1, selector=swap())
-        board.pop()
-        values.append((value, move))
+    moves = list(board.legal_moves)
+    if first in moves:
+        moves.remove(first)
+        moves.insert(0, first)
+    start = time.perf_counter()
+    first_move_time = 0
+    try:
+        for move in moves:
+            board.push(move)
+            value, reached_end, best_board = alpha_beta(board, depth - 1, selector=swap(), deadline=deadline)
+            board.pop()
+            if not values:
+                first_move_time = time.perf_counter() - start
+            values.append((value, move))
+    except OutOfTimeException:
+        if not values:
+            raise
+        reached_end = None  # Unfinished depth
 
     extremum = selector(values, key=operator.itemgetter(0))[0]
     # print(f"(alphabeta found {extremum:.2f})", end=" ")
-    return choice(list(filter(lambda v: v[0] == extremum, values)))[1], best_board, reached_end
-
-
-def out_of_time_handler(signum, frame):
-    print("Time is over")
-    raise OutOfTimeException
+    return choice(list(filter(lambda v: v[0] == extremum, values)))[1], best_board, reached_end, first_move_time
 
 
 def iter_deep(board, available_time, selector=max):
-    signal.signal(signal.SIGALRM, out_of_time_handler)
-    signal.alarm(available_time)
+    deadline = Deadline(available_time)
 
     best_estimation = choice(list(board.legal_moves))
 
     depth = 1
-    time_took = 0
     reached_end = False
     board_value = "unknown"
+    depth_times = []
     try:
-        while available_time > time_took and not reached_end:
-            start = time.perf_counter()
-            best_estimation, board_value, reached_end = max_alpha(board, depth, selector=selector)
-            end = time.perf_counter()
-            time_took += end - start
+        while not reached_end:
+            if len(depth_times) >= 2:  # On ne commence une profondeur que si son premier coup a le temps d'être fini
+                estimate = first_move_time * depth_times[-1] / max(depth_times[-2], 1e-6)
+                if deadline.remaining() < estimate:
+                    break
+            start = deadline.elapsed()
+            best_estimation, board_value, reached_end, first_move_time = max_alpha(
+                board, depth, selector=selector, first=best_estimation, deadline=deadline)
+            if reached_end is None:
+                break
+            depth_times.append(deadline.elapsed() - start)
             depth += 1
-
-        signal.alarm(0)
     except OutOfTimeException as ignored:
-        pass
+        print("Time is over")
+    finally:
+        took = deadline.elapsed()
 
-    print(f"iter_deep took {time_took} seconds, reached depth {depth} ({reached_end=}), board estimated : {board_value}.")
+    print(f"iter_deep took {took} seconds, reached depth {depth} ({reached_end=}), board estimated : {board_value}.")
     return best_estimation
 
 